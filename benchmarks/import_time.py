@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Cold import time check for the pancaim_cdm package.
+
+Imports each module in a fresh interpreter and fails (exit code 1) if
+the import takes longer than the budget, or if it loads a heavy
+dependency that should only be imported on first use.
+
+Run from the project root, e.g.:
+
+    python ./benchmarks/import_time.py --budget 0.1
+
+The same check runs as part of the tests (tests/test_import_time.py).
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+
+# maximum seconds per cold import
+BUDGET = 0.1
+
+# module : heavy dependencies it must not import eagerly
+IMPORT_CHECKS = {
+    'pancaim_cdm': ('pandas', 'sqlalchemy', 'importlib.metadata'),
+    'pancaim_cdm.semantic_mapping': ('pandas', 'sqlalchemy'),
+    'pancaim_cdm.semantic_mapping.semantic_mapper': ('pandas', 'numpy', 'sqlalchemy'),
+    'pancaim_cdm.semantic_mapping.controlled_terms.person': ('pandas', 'sqlalchemy'),
+    'pancaim_cdm.semantic_mapping.controlled_terms.surgery': ('pandas', 'sqlalchemy'),
+}
+
+_MEASURE = '''
+import json, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(json.dumps({{'seconds': seconds, 'modules': sorted(sys.modules)}}))
+'''
+
+
+def measure(module: str, repeat: int) -> dict:
+    """Best cold import time of a module, and the modules it loaded."""
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', _MEASURE.format(module=module)],
+                                check=True, capture_output=True, text=True).stdout
+        runs.append(json.loads(output))
+    return min(runs, key=lambda run: run['seconds'])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--budget', type=float, default=BUDGET, help='maximum seconds per import')
+    parser.add_argument('--repeat', type=int, default=5, help='imports per module (best is kept)')
+    args = parser.parse_args()
+
+    failed = False
+    for module, heavy_modules in IMPORT_CHECKS.items():
+        run = measure(module, args.repeat)
+        loaded = [heavy for heavy in heavy_modules if heavy in run['modules']]
+        status = 'ok'
+        if run['seconds'] > args.budget or loaded:
+            status = 'FAILED'
+            failed = True
+        print(f'{module:55} {run["seconds"]:.3f}s {status}'
+              + (f' (imports {", ".join(loaded)})' if loaded else ''))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
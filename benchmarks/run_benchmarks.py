@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmarks for semantic mapping.
+
+Run from the project root, e.g.:
+
+    python ./benchmarks/run_benchmarks.py --output results.json
+    python ./benchmarks/run_benchmarks.py --compare results.json
+
+Results are written as JSON, so runs of different package versions
+can be compared.
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+from importlib.metadata import version
+from typing import Callable, Dict, List
+
+import pandas as pd
+
+from synthetic_data import MODELS, build_table_mapping, field_kind_samples, generate_source
+
+
+def _best_time(function: Callable[[], object], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def _result(name: str, rows: int, seconds: float) -> Dict:
+    return {'name': name, 'rows': rows, 'seconds': seconds, 'rows_per_second': rows / seconds}
+
+
+def benchmark_lookup(rows: int, repeat: int) -> List[Dict]:
+    """SemanticMapper.lookup and map_series per field kind."""
+    results = []
+    for kind, (mapper, values) in field_kind_samples(rows).items():
+        series = pd.Series(values, dtype=object)
+        seconds = _best_time(lambda: [mapper.lookup(value) for value in values], repeat)
+        results.append(_result(f'lookup.{kind}', rows, seconds))
+        seconds = _best_time(lambda: mapper.map_series(series), repeat)
+        results.append(_result(f'map_series.{kind}', rows, seconds))
+    return results
+
+
+def benchmark_tables(rows: int, repeat: int) -> List[Dict]:
+    """End-to-end mapping of a source chunk per CDM table."""
+    results = []
+    for model in MODELS:
+        source = generate_source(model, rows)
+        table_mapping = build_table_mapping(model)
+        seconds = _best_time(lambda: table_mapping.map_chunk(source), repeat)
+        results.append(_result(f'map_table.{model.__tablename__}', rows, seconds))
+    return results
+
+
+def compare(results: List[Dict], baseline_path: str) -> None:
+    """Print the throughput of each benchmark relative to a baseline run."""
+    with open(baseline_path) as baseline_file:
+        baseline = {result['name']: result for result in json.load(baseline_file)['results']}
+    print(f'{"benchmark":40} {"rows/s":>14} {"baseline":>14} {"ratio":>7}')
+    for result in results:
+        previous = baseline.get(result['name'])
+        if previous is None:
+            continue
+        ratio = result['rows_per_second'] / previous['rows_per_second']
+        print(f'{result["name"]:40} {result["rows_per_second"]:14,.0f} '
+              f'{previous["rows_per_second"]:14,.0f} {ratio:7.2f}')
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100_000, help='rows per benchmark')
+    parser.add_argument('--repeat', type=int, default=3, help='repetitions (best is kept)')
+    parser.add_argument('--output', help='write results to this JSON file')
+    parser.add_argument('--compare', help='compare results to this JSON file')
+    args = parser.parse_args()
+
+    results = benchmark_lookup(args.rows, args.repeat) + benchmark_tables(args.rows, args.repeat)
+    run = {
+        'package_version': version('pancaim-cdm'),
+        'python_version': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'rows': args.rows,
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(run, output_file, indent=2)
+    else:
+        json.dump(run, sys.stdout, indent=2)
+        print()
+    if args.compare:
+        compare(results, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+"""Synthetic, deliberately dirty source data for all PANCAIM CDM tables."""
+
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import Boolean, Date, Integer, Numeric
+
+from pancaim_cdm.pancaim_orm import (
+    Person,
+    BodyMeasurement,
+    Lab,
+    Lab2,
+    Prognosis,
+    Surgery,
+    Therapy,
+    Tumor,
+)
+from pancaim_cdm.pipeline import TableMapping
+from pancaim_cdm.semantic_mapping import SemanticMapper
+from pancaim_cdm.semantic_mapping.controlled_terms.person import Sex, VitalStatus
+from pancaim_cdm.semantic_mapping.controlled_terms.surgery import SurgeryPurpose, SurgicalTechnique
+from pancaim_cdm.semantic_mapping.date_format import DateFormat
+
+MODELS = (Person, BodyMeasurement, Lab, Lab2, Prognosis, Surgery, Therapy, Tumor)
+
+# controlled term Enum by (table, field)
+CONTROLLED_TERMS = {
+    ('person', 'sex'): Sex,
+    ('person', 'vital_status'): VitalStatus,
+    ('surgery', 'surgery_purpose'): SurgeryPurpose,
+    ('surgery', 'surgical_technique'): SurgicalTechnique,
+}
+
+DATE_FORMATS = {
+    '%Y-%m-%d': DateFormat.YMD,
+    '%d-%m-%Y': DateFormat.YMD,
+    '%Y': DateFormat.Y,
+}
+
+# share of null-like and unmappable values in every source column
+NULL_RATE = 0.05
+DIRTY_RATE = 0.03
+
+
+def source_columns(model) -> list:
+    """Columns of a model that are mapped from source data."""
+    return [column for column in model.__table__.columns
+            if not column.name.endswith('_raw_value')
+            and not (column.primary_key and column.name != 'pancaim_id')
+            and column.name != 'pancaim_id']
+
+
+def _controlled_terms(column):
+    return CONTROLLED_TERMS.get((column.table.name, column.name))
+
+
+def _dirty(rng: np.random.Generator, values: np.ndarray) -> np.ndarray:
+    # add nulls, empty strings, surrounding spaces and garbage
+    values = values.astype(object)
+    draw = rng.random(len(values))
+    values[draw < NULL_RATE / 2] = None
+    values[(draw >= NULL_RATE / 2) & (draw < NULL_RATE)] = '  '
+    values[(draw >= NULL_RATE) & (draw < NULL_RATE + DIRTY_RATE)] = 'n.a.'
+    padded = (draw >= 0.9)
+    values[padded] = [f' {value} ' if value is not None else None for value in values[padded]]
+    return values
+
+
+def _source_values(rng: np.random.Generator, column, rows: int) -> np.ndarray:
+    if _controlled_terms(column) is not None:
+        terms = [term.value for term in _controlled_terms(column)]
+        variants = terms + [term.lower() for term in terms] + [term.upper() for term in terms]
+        return _dirty(rng, rng.choice(variants, rows))
+    if isinstance(column.type, Date):
+        # a few thousand distinct dates, in several formats
+        dates = pd.date_range('1940-01-01', '2022-12-31', periods=5_000)
+        picked = dates[rng.integers(0, len(dates), rows)]
+        values = np.where(rng.random(rows) < 0.8,
+                          picked.strftime('%Y-%m-%d'), picked.strftime('%d-%m-%Y'))
+        return _dirty(rng, values)
+    if isinstance(column.type, Numeric):
+        values = np.round(rng.lognormal(3, 1, rows), 1).astype(str)
+        return _dirty(rng, values)
+    if isinstance(column.type, Integer):
+        return _dirty(rng, rng.integers(0, 5, rows).astype(str))
+    if isinstance(column.type, Boolean):
+        return _dirty(rng, rng.choice(['yes', 'no', 'Yes', 'No', '1', '0'], rows))
+    return _dirty(rng, rng.choice([f'category {index}' for index in range(20)], rows))
+
+
+def generate_source(model, rows: int, persons: int = 10_000, seed: int = 0) -> pd.DataFrame:
+    """
+    Generate source data for a CDM table.
+
+    Source columns are named after the target fields. The person table
+    gets one row per pancaim_id; other tables reference random persons.
+    """
+    rng = np.random.default_rng(seed)
+    if model is Person:
+        pancaim_ids = np.arange(1, rows + 1)
+    else:
+        pancaim_ids = rng.integers(1, persons + 1, rows)
+    data = {'pancaim_id': pancaim_ids}
+    for column in source_columns(model):
+        data[column.name] = _source_values(rng, column, rows)
+    return pd.DataFrame(data)
+
+
+def build_mapper(column, coerce_types: bool = False) -> SemanticMapper:
+    """
+    Semantic mapper for a column of the synthetic source data.
+
+    With `coerce_types`, numeric and boolean values are converted to the
+    field type (e.g. to load realistic rows); otherwise, they are kept
+    as raw values only.
+    """
+    if _controlled_terms(column) is not None:
+        mappings = {}
+        for term in _controlled_terms(column):
+            for variant in (term.value, term.value.lower(), term.value.upper()):
+                mappings[variant] = term
+        return SemanticMapper(column, mappings)
+    if isinstance(column.type, Date):
+        return SemanticMapper(column, {}, DATE_FORMATS)
+    return SemanticMapper(column, {}, coerce_types=coerce_types)
+
+
+def build_table_mapping(model, coerce_types: bool = False) -> TableMapping:
+    """Table mapping for the synthetic source data of a CDM table."""
+    mappers = {column.name: build_mapper(column, coerce_types) for column in source_columns(model)}
+    return TableMapping(model, mappers, copy_columns={'pancaim_id': 'pancaim_id'})
+
+
+def field_kind_samples(rows: int, seed: int = 0) -> Dict[str, Tuple[SemanticMapper, List]]:
+    """Mapper and source values for one field of each field kind."""
+    samples = {
+        'date': Lab.__table__.c.lab_date,
+        'controlled_term': Person.__table__.c.sex,
+        'nullable_controlled_term': Surgery.__table__.c.surgical_technique,
+        'numeric': Lab.__table__.c.albumin,
+    }
+    rng = np.random.default_rng(seed)
+    return {kind: (build_mapper(column), list(_source_values(rng, column, rows)))
+            for kind, column in samples.items()}
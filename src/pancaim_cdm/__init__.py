@@ -1,15 +1,33 @@
 """PANCAIM CDM ORM package."""
 
-import importlib.metadata
-__version__ = importlib.metadata.version('pancaim-cdm')
-
-from pancaim_cdm.pancaim_orm import (
-    Person,
-    BodyMeasurement,
-    Lab,
-    Lab2,
-    Prognosis,
-    Surgery,
-    Therapy,
-    Tumor,
+# The package version and the ORM models are loaded on first access, as
+# importlib.metadata and the SQLAlchemy declarative registry are slow to
+# import (e.g. for short-lived worker processes).
+_MODELS = (
+    'Person',
+    'BodyMeasurement',
+    'Lab',
+    'Lab2',
+    'Prognosis',
+    'Surgery',
+    'Therapy',
+    'Tumor',
 )
+
+__all__ = ['__version__', *_MODELS]
+
+
+def __getattr__(name):
+    if name == '__version__':
+        import importlib.metadata
+        version = importlib.metadata.version('pancaim-cdm')
+        globals()['__version__'] = version
+        return version
+    if name in _MODELS:
+        from pancaim_cdm import pancaim_orm
+        return getattr(pancaim_orm, name)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+def __dir__():
+    return sorted([*globals(), *__all__])
@@ -0,0 +1,135 @@
+"""Compact pandas dtypes for mapped CDM tables, derived from the data model."""
+
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import Boolean, Column, Date, Integer, Numeric, Text
+
+from pancaim_cdm.semantic_mapping.controlled_terms import controlled_term_index
+from pancaim_cdm.semantic_mapping.unmapped_value import UNMAPPED_VALUE
+
+
+@lru_cache(maxsize=None)
+def string_dtype() -> pd.StringDtype:
+    """Return the Arrow backed string dtype, or the Python one without pyarrow."""
+    try:
+        return pd.StringDtype('pyarrow')
+    except ImportError:
+        return pd.StringDtype()
+
+
+@lru_cache(maxsize=None)
+def controlled_term_dtype(table_name: str, field_name: str) -> pd.CategoricalDtype:
+    """Return the categorical dtype of a controlled term field (incl. the unmapped placeholder)."""
+    values = controlled_term_index().allowed_values(table_name, field_name)
+    return pd.CategoricalDtype(sorted(values | {UNMAPPED_VALUE}))
+
+
+def field_dtype(table_name: str, column: Column):
+    """
+    Return the compact pandas dtype of a CDM table field.
+
+    Controlled term fields are categorical, other Text fields (e.g. raw
+    values) use the (Arrow backed) string dtype, and Integer, Numeric,
+    Boolean and Date fields the nullable Int32, Float64, boolean and
+    datetime64 dtypes. Dates outside the datetime64 range (years
+    1678-2261, e.g. the typo 0202-01-05) and integers outside the Int32
+    range are missing values, and only kept as raw value.
+
+    Parameters
+    ----------
+    table_name: str
+        Name of the CDM table.
+    column: Column
+        Field of the CDM table.
+    """
+    if isinstance(column.type, Integer):
+        return pd.Int32Dtype()
+    if isinstance(column.type, Numeric):
+        return pd.Float64Dtype()
+    if isinstance(column.type, Boolean):
+        return pd.BooleanDtype()
+    if isinstance(column.type, Date):
+        return 'datetime64[ns]'
+    if isinstance(column.type, Text):
+        if (table_name, column.name) in controlled_term_index():
+            return controlled_term_dtype(table_name, column.name)
+        return string_dtype()
+    raise TypeError(f'No dtype for column type: {table_name}.{column.name} {column.type}')
+
+
+def table_dtypes(model) -> Dict[str, object]:
+    """Return a dictionary of field name : compact dtype for a CDM table."""
+    return {column.name: field_dtype(model.__tablename__, column) for column in model.__table__.columns}
+
+
+def _convert(values: pd.Series, dtype) -> pd.Series:
+    if isinstance(dtype, pd.CategoricalDtype):
+        converted = values.astype(dtype)
+        # astype silently turns values outside the categories into nan
+        invalid = converted.isna() & values.notna()
+        if invalid.any():
+            raise ValueError(f'Not a controlled term of {values.name}: {values[invalid].iloc[0]!r}')
+        return converted
+    if isinstance(dtype, pd.Int32Dtype):
+        # values outside the range of the field type become missing, and
+        # are kept only as raw value
+        numbers = pd.to_numeric(values)
+        info = np.iinfo(np.int32)
+        return numbers.where((numbers >= info.min) & (numbers <= info.max)).astype(dtype)
+    if isinstance(dtype, pd.Float64Dtype):
+        return pd.to_numeric(values).astype(dtype)
+    if dtype == 'datetime64[ns]':
+        # mapped dates are ISO strings, possibly partial (e.g. 2020-01)
+        return pd.to_datetime(values, errors='coerce')
+    return values.astype(dtype)
+
+
+def to_date(value: Any) -> Optional[date]:
+    """
+    Convert a mapped date to a date object.
+
+    Mapped dates are ISO strings, possibly partial (e.g. 2020-01 is
+    2020-01-01) or with a year before 1000. Values that are not dates
+    are returned as None.
+    """
+    if value is pd.NaT:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, str):
+        parts = value.split('-')
+        try:
+            year, month, day = (int(part) for part in parts + ['1'] * (3 - len(parts)))
+            return date(year, month, day)
+        except ValueError:
+            return None
+    return None
+
+
+def to_dates(values: pd.Series) -> pd.Series:
+    """Convert a column of mapped dates to date objects (see `to_date`), None for missing values."""
+    return values.astype(object).map(to_date)
+
+
+def compact(model, frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convert the columns of a mapped CDM table to their compact dtypes.
+
+    Columns that are not fields of the table are left as they are.
+
+    Parameters
+    ----------
+    model: type
+        PANCAIM CDM model class (e.g. Lab).
+    frame: pd.DataFrame
+        Mapped rows, with columns named after the table fields.
+    """
+    dtypes = table_dtypes(model)
+    return frame.assign(**{name: _convert(values, dtypes[name])
+                           for name, values in frame.items() if name in dtypes})
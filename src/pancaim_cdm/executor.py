@@ -0,0 +1,148 @@
+"""Parallel mapping of CDM tables with a process pool."""
+
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from pancaim_cdm.pipeline import TableMapping
+from pancaim_cdm.semantic_mapping.statistics import MapperStatistics
+
+# table mappings of the current worker process, by table name
+_worker_table_mappings: Dict[str, TableMapping] = {}
+
+
+def _init_worker(table_mappings: Dict[str, TableMapping]) -> None:
+    # mappings are sent (pickled) once per worker, not once per chunk;
+    # statistics are counted from zero, as the parent keeps its counts
+    _worker_table_mappings.update(table_mappings)
+    for table_mapping in table_mappings.values():
+        for mapper in table_mapping.mappers.values():
+            if mapper.statistics is not None:
+                mapper.statistics.reset()
+
+
+def _map_chunk(table_name: str, chunk: pd.DataFrame) \
+        -> Tuple[pd.DataFrame, Dict[str, MapperStatistics]]:
+    # return the statistics collected for the chunk (if enabled) with the
+    # mapped chunk, as the worker copies of the mappers are not registered
+    table_mapping = _worker_table_mappings[table_name]
+    mapped_chunk = table_mapping.map_chunk(chunk)
+    statistics = {source_column: mapper.statistics.reset()
+                  for source_column, mapper in table_mapping.mappers.items()
+                  if mapper.statistics is not None}
+    return mapped_chunk, statistics
+
+
+class ParallelMapper:
+    """
+    Map the chunks of several CDM tables in a pool of worker processes.
+
+    The table mappings are pickled and sent to each worker once, when the
+    worker starts. Mapped chunks are returned in a deterministic order:
+    tables in the order of the sources, chunks in source order. If
+    statistics are enabled (see `TableMapping.enable_statistics`, before
+    creating the ParallelMapper), the statistics of the workers are
+    merged into the mappers of this process with each returned chunk.
+
+    Attributes
+    ----------
+    table_mappings: list[TableMapping]
+        Mappers for each CDM table (one TableMapping per table).
+    max_workers: int, optional
+        Number of worker processes (default: number of CPUs).
+    max_pending: int, optional
+        Maximum number of chunks submitted but not yet returned, which
+        bounds memory use (default: twice the number of workers).
+    """
+
+    def __init__(self,
+                 table_mappings: List[TableMapping],
+                 max_workers: Optional[int] = None,
+                 max_pending: Optional[int] = None):
+        self.table_mappings = {table_mapping.model.__tablename__: table_mapping
+                               for table_mapping in table_mappings}
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_pending = max_pending or 2 * self.max_workers
+        # mappers of which the workers collect statistics
+        self._instrumented = self._instrumented_mappers()
+        self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                             initializer=_init_worker,
+                                             initargs=(self.table_mappings,))
+
+    def _instrumented_mappers(self) -> List[Tuple[str, str]]:
+        return [(table_name, source_column)
+                for table_name, table_mapping in self.table_mappings.items()
+                for source_column, mapper in table_mapping.mappers.items()
+                if mapper.statistics is not None]
+
+    def __enter__(self) -> 'ParallelMapper':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.shutdown()
+
+    def shutdown(self) -> None:
+        """Stop the worker processes."""
+        self._executor.shutdown()
+
+    def imap(self, sources: Dict[str, Iterable[pd.DataFrame]]) \
+            -> Iterator[Tuple[str, pd.DataFrame]]:
+        """
+        Map source chunks of each table in parallel.
+
+        Parameters
+        ----------
+        sources: dict[str, iterable of pd.DataFrame]
+            Dictionary of table name : source chunks.
+
+        Returns
+        -------
+        Iterator of (table name, mapped chunk) tuples, in source order.
+
+        Raises
+        ------
+        ValueError
+            If statistics were enabled after creating the ParallelMapper,
+            as the workers would not collect them.
+        """
+        if self._instrumented_mappers() != self._instrumented:
+            raise ValueError('Statistics must be enabled before creating the ParallelMapper')
+        pending: Deque[Tuple[str, Future]] = deque()
+        for table_name, chunks in sources.items():
+            if table_name not in self.table_mappings:
+                raise KeyError(f'No table mapping for table: {table_name}')
+            for chunk in chunks:
+                pending.append((table_name, self._executor.submit(_map_chunk, table_name, chunk)))
+                if len(pending) >= self.max_pending:
+                    yield self._result(*pending.popleft())
+        while pending:
+            yield self._result(*pending.popleft())
+
+    def _result(self, table_name: str, future: Future) -> Tuple[str, pd.DataFrame]:
+        mapped_chunk, statistics = future.result()
+        mappers = self.table_mappings[table_name].mappers
+        for source_column, mapper_statistics in statistics.items():
+            mappers[source_column].merge_statistics(mapper_statistics)
+        return table_name, mapped_chunk
+
+    def map_tables(self, sources: Dict[str, Iterable[pd.DataFrame]]) -> Dict[str, pd.DataFrame]:
+        """
+        Map all source chunks and combine them per table.
+
+        Parameters
+        ----------
+        sources: dict[str, iterable of pd.DataFrame]
+            Dictionary of table name : source chunks.
+
+        Returns
+        -------
+        Dictionary of table name : mapped table.
+        """
+        mapped_chunks: Dict[str, List[pd.DataFrame]] = {table_name: [] for table_name in sources}
+        for table_name, mapped_chunk in self.imap(sources):
+            mapped_chunks[table_name].append(mapped_chunk)
+        return {table_name: pd.concat(chunks) if chunks else pd.DataFrame()
+                for table_name, chunks in mapped_chunks.items()}
@@ -0,0 +1,292 @@
+"""Columnar (Parquet / Arrow IPC) export of the PANCAIM CDM tables."""
+
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Sequence, Union
+
+import pandas as pd
+from sqlalchemy import Boolean, Column, Date, Integer, Numeric, Text, select
+from sqlalchemy.engine import Connection, Engine
+
+from pancaim_cdm.dtypes import to_dates
+from pancaim_cdm.pancaim_orm import BodyMeasurement, Lab, Lab2, Person, Prognosis, Surgery, Therapy, Tumor
+from pancaim_cdm.semantic_mapping.controlled_terms import controlled_term_index
+from pancaim_cdm.semantic_mapping.unmapped_value import UNMAPPED_VALUE
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError as error:
+    raise ImportError('The columnar export requires pyarrow, install it with: '
+                      'pip install pancaim-cdm[ARROW]') from error
+
+PARQUET = 'parquet'
+ARROW = 'arrow'
+
+# all models, parents before children
+MODELS = (Person, BodyMeasurement, Lab, Lab2, Prognosis, Surgery, Therapy, Tumor)
+
+# name of the directory partition column
+PARTITION_COLUMN = 'pancaim_id_range'
+
+# default maximum number of partition files open at once
+MAX_OPEN_FILES = 64
+
+
+def _arrow_type(table_name: str, column: Column) -> 'pa.DataType':
+    if isinstance(column.type, Integer):
+        return pa.int32()
+    if isinstance(column.type, Numeric):
+        return pa.float64()
+    if isinstance(column.type, Date):
+        return pa.date32()
+    if isinstance(column.type, Boolean):
+        return pa.bool_()
+    if isinstance(column.type, Text):
+        if (table_name, column.name) in controlled_term_index():
+            # few distinct values per column
+            return pa.dictionary(pa.int32(), pa.string())
+        return pa.string()
+    raise TypeError(f'Unsupported column type for export: {table_name}.{column.name} {column.type}')
+
+
+def arrow_schema(model) -> 'pa.Schema':
+    """
+    Return the Arrow schema of a CDM table.
+
+    Integer, Numeric, Date, Boolean and Text columns are exported as
+    int32, float64, date32, bool and string columns. Controlled term
+    columns are dictionary encoded, with the controlled terms (and the
+    placeholder for unmapped values) as dictionary. Nullability follows
+    the model, except for the surrogate primary keys (e.g. lab_id),
+    which mapped rows get from the database when they are loaded.
+
+    Parameters
+    ----------
+    model: type
+        PANCAIM CDM model class (e.g. Lab).
+    """
+    table_name = model.__tablename__
+    return pa.schema([pa.field(column.name, _arrow_type(table_name, column), nullable=_nullable(column))
+                      for column in model.__table__.columns])
+
+
+def _nullable(column: Column) -> bool:
+    return column.nullable or (column.primary_key and column.name != 'pancaim_id')
+
+
+def _dictionary(table_name: str, field_name: str) -> pd.Index:
+    # the same dictionary for every chunk, as Arrow IPC files do not
+    # support replacing a dictionary
+    values = controlled_term_index().allowed_values(table_name, field_name)
+    return pd.Index(sorted(values | {UNMAPPED_VALUE}), dtype=object)
+
+
+def _dictionary_array(values: pd.Series, dictionary: pd.Index) -> 'pa.DictionaryArray':
+    indices = dictionary.get_indexer(values.astype(object))
+    invalid = (indices == -1) & values.notna().to_numpy()
+    if invalid.any():
+        raise ValueError(f'Not a controlled term of {values.name}: {values[invalid].iloc[0]!r}')
+    return pa.DictionaryArray.from_arrays(pa.array(indices, type=pa.int32(), mask=indices == -1),
+                                          pa.array(dictionary, type=pa.string()))
+
+
+def _arrow_array(values: pd.Series, arrow_type: 'pa.DataType') -> 'pa.Array':
+    if pa.types.is_integer(arrow_type) or pa.types.is_floating(arrow_type):
+        return pa.array(pd.to_numeric(values), type=arrow_type, from_pandas=True)
+    if pa.types.is_date(arrow_type):
+        return pa.array(to_dates(values), type=arrow_type, from_pandas=True)
+    return pa.array(values.astype(object), type=arrow_type, from_pandas=True)
+
+
+def to_arrow(model, frame: pd.DataFrame) -> 'pa.Table':
+    """
+    Convert mapped rows of a CDM table to an Arrow table.
+
+    Columns of the table that are missing from the data are exported as
+    null columns.
+
+    Parameters
+    ----------
+    model: type
+        PANCAIM CDM model class (e.g. Lab).
+    frame: pd.DataFrame
+        Mapped rows, with columns named after the table fields.
+
+    Raises
+    ------
+    ValueError
+        If a required field (e.g. lab_date) is missing, or has missing
+        values (e.g. dates that could not be parsed).
+    """
+    schema = arrow_schema(model)
+    arrays = []
+    for field in schema:
+        if field.name in frame.columns and pa.types.is_dictionary(field.type):
+            dictionary = _dictionary(model.__tablename__, field.name)
+            arrays.append(_dictionary_array(frame[field.name], dictionary))
+        elif field.name in frame.columns:
+            arrays.append(_arrow_array(frame[field.name], field.type))
+        else:
+            arrays.append(pa.nulls(len(frame), type=field.type))
+        if not field.nullable and arrays[-1].null_count:
+            # Parquet and Arrow readers cannot read nulls in a required column
+            raise ValueError(f'Required field {model.__tablename__}.{field.name} has '
+                             f'{arrays[-1].null_count} missing values')
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+class _Writers:
+    # Parquet or Arrow IPC file writers of the output directories, at
+    # most max_open at once, least recently used closed first. A closed
+    # file cannot be appended to: further rows of its directory go to a
+    # new file, <stem>-<n>.<format>.
+
+    def __init__(self, schema: 'pa.Schema', file_format: str, max_open: int = MAX_OPEN_FILES):
+        if max_open < 1:
+            raise ValueError(f'max_open must be at least 1, not {max_open}')
+        self.schema = schema
+        self.file_format = file_format
+        self.max_open = max_open
+        self._writers = OrderedDict()
+        # number of files written per directory
+        self._file_counts = {}
+
+    def write(self, directory: Path, stem: str, table: 'pa.Table') -> None:
+        key = (directory, stem)
+        writer = self._writers.get(key)
+        if writer is None:
+            if len(self._writers) >= self.max_open:
+                self._writers.popitem(last=False)[1].close()
+            writer = self._open(directory, stem)
+            self._writers[key] = writer
+        else:
+            self._writers.move_to_end(key)
+        writer.write_table(table)
+
+    def _open(self, directory: Path, stem: str):
+        file_count = self._file_counts.get((directory, stem), 0)
+        self._file_counts[(directory, stem)] = file_count + 1
+        name = f'{stem}-{file_count}' if file_count else stem
+        path = directory / f'{name}.{self.file_format}'
+        directory.mkdir(parents=True, exist_ok=True)
+        if self.file_format == PARQUET:
+            return pyarrow.parquet.ParquetWriter(str(path), self.schema)
+        return pyarrow.ipc.new_file(str(path), self.schema)
+
+    def close(self) -> None:
+        for writer in self._writers.values():
+            writer.close()
+        self._writers.clear()
+
+
+def export_table(model, chunks: Iterable[pd.DataFrame], directory: Union[str, Path],
+                 file_format: str = PARQUET, partition_size: Optional[int] = None,
+                 max_open_files: int = MAX_OPEN_FILES) -> int:
+    """
+    Write mapped rows of a CDM table to a Parquet or Arrow IPC file.
+
+    Without partitioning, the table is written to ``<directory>/<table>.parquet``
+    (or ``.arrow``). With partitioning, rows are split by pancaim_id range
+    into ``<directory>/<table>/pancaim_id_range=<start>/part.parquet``
+    (hive style), where ``<start>`` is the first pancaim_id of the range.
+    At most `max_open_files` partition files are open at once; when
+    more partitions are written to, the least recently written file is
+    closed, and further rows of its partition go to a new file in the
+    partition directory (``part-1.parquet``, ...). Rows sorted by
+    pancaim_id are written to a single file per partition.
+
+    Parameters
+    ----------
+    model: type
+        PANCAIM CDM model class (e.g. Lab).
+    chunks: iterable of pd.DataFrame
+        Mapped rows, e.g. from `map_chunks`.
+    directory: str or Path
+        Export directory.
+    file_format: str
+        'parquet' or 'arrow' (Arrow IPC file, which can be memory mapped).
+    partition_size: int, optional
+        Number of pancaim_ids per partition.
+    max_open_files: int
+        Maximum number of partition files open at once.
+
+    Returns
+    -------
+    Number of exported rows.
+    """
+    if file_format not in (PARQUET, ARROW):
+        raise ValueError(f'Unknown file format: {file_format}')
+    directory = Path(directory)
+    table_name = model.__tablename__
+    writers = _Writers(arrow_schema(model), file_format, max_open_files)
+    row_count = 0
+    try:
+        for chunk in chunks:
+            if not len(chunk):
+                continue
+            if partition_size is None:
+                writers.write(directory, table_name, to_arrow(model, chunk))
+            else:
+                starts = pd.to_numeric(chunk['pancaim_id']) // partition_size * partition_size
+                for start, partition in chunk.groupby(starts.to_numpy(), sort=True):
+                    partition_directory = directory / table_name / f'{PARTITION_COLUMN}={start}'
+                    writers.write(partition_directory, 'part', to_arrow(model, partition))
+            row_count += len(chunk)
+        if partition_size is None and not row_count:
+            writers.write(directory, table_name, to_arrow(model, pd.DataFrame()))
+    finally:
+        writers.close()
+    return row_count
+
+
+def export_database(bind: Union[Engine, Connection], directory: Union[str, Path],
+                    models: Sequence = MODELS, chunk_size: int = 100_000,
+                    file_format: str = PARQUET, partition_size: Optional[int] = None,
+                    max_open_files: int = MAX_OPEN_FILES) -> Dict[str, int]:
+    """
+    Export CDM tables from the database, reading each table once in chunks.
+
+    Rows are streamed from the database (with a server-side cursor where
+    the driver supports it, e.g. psycopg2), so only a chunk is held in
+    memory at a time. With partitioning, rows are read sorted by
+    pancaim_id, so each partition is written to a single file.
+
+    Parameters
+    ----------
+    bind: Engine or Connection
+        Database to export from.
+    directory: str or Path
+        Export directory.
+    models: sequence of type
+        PANCAIM CDM model classes to export (default: all).
+    chunk_size: int
+        Number of rows read from the database at once.
+    file_format: str
+        'parquet' or 'arrow'.
+    partition_size: int, optional
+        Number of pancaim_ids per partition (see `export_table`).
+    max_open_files: int
+        Maximum number of partition files open at once.
+
+    Returns
+    -------
+    Dictionary of table name : number of exported rows.
+    """
+    if isinstance(bind, Engine):
+        with bind.connect() as connection:
+            return export_database(connection, directory, models, chunk_size,
+                                   file_format, partition_size, max_open_files)
+    # without stream_results, the driver fetches the whole result before
+    # read_sql_query splits it into chunks
+    streaming = bind.execution_options(stream_results=True)
+    row_counts = {}
+    for model in models:
+        query = select(model.__table__)
+        if partition_size is not None:
+            query = query.order_by(model.__table__.c.pancaim_id)
+        chunks = pd.read_sql_query(query, streaming, chunksize=chunk_size, coerce_float=False)
+        row_counts[model.__tablename__] = export_table(model, chunks, directory, file_format,
+                                                       partition_size, max_open_files)
+    return row_counts
@@ -0,0 +1,259 @@
+"""Incremental (delta) loading of mapped data into the PANCAIM CDM tables."""
+
+from dataclasses import dataclass
+from typing import Iterable, List, Union
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import BigInteger, Boolean, Column, Date, Index, Integer, MetaData, Numeric, Table, \
+    Text, bindparam, select
+from sqlalchemy.engine import Connection, Engine
+
+from pancaim_cdm.dtypes import to_dates
+from pancaim_cdm.loader import bulk_load
+from pancaim_cdm.pancaim_orm import CDM_SCHEMA, Person
+
+PANCAIM_ID = 'pancaim_id'
+
+# maximum number of values per IN clause of a DELETE statement
+_DELETE_BATCH_SIZE = 10_000
+
+# fingerprinted value of missing values
+_NULL = '\x00'
+
+# Not part of the ORM metadata, so that create_all does not create it;
+# stored in the database loaded into, so rows and their fingerprints
+# are written in the same transaction
+_metadata = MetaData()
+row_fingerprint = Table(
+    'row_fingerprint', _metadata,
+    Column('table_name', Text, primary_key=True),
+    Column('row_id', BigInteger, primary_key=True, autoincrement=False),
+    Column(PANCAIM_ID, Integer, nullable=False),
+    Column('row_hash', BigInteger, nullable=False),
+    Index('row_fingerprint_pancaim_id', PANCAIM_ID),
+    schema=CDM_SCHEMA,
+)
+
+
+@dataclass
+class DeltaSummary:
+    """
+    Number of rows written by an incremental load.
+
+    Attributes
+    ----------
+    inserted: int
+        Number of new rows.
+    updated: int
+        Number of changed rows.
+    deleted: int
+        Number of rows no longer present in the source.
+    unchanged: int
+        Number of rows that were not written.
+    """
+    inserted: int = 0
+    updated: int = 0
+    deleted: int = 0
+    unchanged: int = 0
+
+
+def load_fingerprints(connection: Connection, table_name: str) -> pd.DataFrame:
+    """
+    Return the fingerprints of the loaded rows of a table.
+
+    A fingerprint is a 64-bit hash of the values (and raw values) of a
+    loaded row, stored per table by primary key and pancaim_id in the
+    row_fingerprint table of the CDM schema.
+
+    Returns
+    -------
+    DataFrame with columns pancaim_id and row_hash, indexed by
+    primary key (row_id).
+    """
+    query = (select(row_fingerprint.c.row_id, row_fingerprint.c.pancaim_id,
+                    row_fingerprint.c.row_hash)
+             .where(row_fingerprint.c.table_name == table_name))
+    fingerprints = pd.DataFrame(connection.execute(query).fetchall(),
+                                columns=['row_id', PANCAIM_ID, 'row_hash'], dtype=np.int64)
+    return fingerprints.set_index('row_id')
+
+
+def _primary_key(model):
+    primary_key = list(model.__table__.primary_key.columns)
+    if len(primary_key) != 1:
+        raise ValueError(f'Incremental loading requires a single column primary key: '
+                         f'{model.__tablename__}')
+    return primary_key[0]
+
+
+def _canonical(column: Column, values: pd.Series) -> pd.Series:
+    # the values of a field as strings, independent of the dtype of the
+    # column (e.g. 1, 1.0 and Int32 1; None, nan and NA; str and category)
+    canonical = pd.Series(_NULL, index=values.index, dtype=object)
+    present = values.notna().to_numpy()
+    values = values[present]
+    if isinstance(column.type, (Integer, Numeric)):
+        canonical[present] = pd.to_numeric(values).astype(np.float64).map(repr)
+    elif isinstance(column.type, Boolean):
+        canonical[present] = values.astype(bool).map(str)
+    elif isinstance(column.type, Date):
+        canonical[present] = to_dates(values).map(lambda value: _NULL if value is None else value.isoformat())
+    else:
+        canonical[present] = values.astype(object).map(str)
+    return canonical
+
+
+def row_fingerprints(model, frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    Compute the fingerprints of mapped rows of a CDM table.
+
+    Rows are hashed over all table fields present in the data (values
+    and raw values), in table order. Values are hashed by field type,
+    not dtype, so equal rows have equal fingerprints whether a column
+    holds e.g. None or nan, floats or integers, or compact dtypes.
+
+    Parameters
+    ----------
+    model: type
+        PANCAIM CDM model class (e.g. Lab).
+    frame: pd.DataFrame
+        Mapped rows, including the primary key and pancaim_id fields.
+
+    Returns
+    -------
+    DataFrame with columns pancaim_id and row_hash, indexed by
+    primary key (row_id).
+    """
+    primary_key = _primary_key(model)
+    missing = {primary_key.name, PANCAIM_ID} - set(frame.columns)
+    if missing:
+        raise ValueError(f'Missing key fields for incremental loading of '
+                         f'{model.__tablename__}: {", ".join(sorted(missing))}')
+    canonical = pd.DataFrame({column.name: _canonical(column, frame[column.name])
+                              for column in model.__table__.columns if column.name in frame.columns})
+    # signed, to fit a BIGINT column
+    row_hash = pd.util.hash_pandas_object(canonical, index=False).to_numpy().view(np.int64)
+    return pd.DataFrame({PANCAIM_ID: frame[PANCAIM_ID].to_numpy(dtype=np.int64),
+                         'row_hash': row_hash},
+                        index=pd.Index(frame[primary_key.name].to_numpy(dtype=np.int64),
+                                       name='row_id'))
+
+
+def _update_rows(connection: Connection, model, frame: pd.DataFrame) -> None:
+    table = model.__table__
+    primary_key = _primary_key(model)
+    columns = [column for column in table.columns if column.name in frame.columns]
+    frame = frame[[column.name for column in columns]].astype(object)
+    frame = frame.where(frame.notna(), None)
+    for column in columns:
+        if isinstance(column.type, Date):
+            frame[column.name] = to_dates(frame[column.name])
+    # bind parameters must not clash with the column names
+    frame = frame.rename(columns=lambda name: f'_{name}')
+    statement = (table.update()
+                 .where(primary_key == bindparam(f'_{primary_key.name}'))
+                 .values({column.name: bindparam(f'_{column.name}')
+                          for column in columns if column is not primary_key}))
+    connection.execute(statement, frame.to_dict('records'))
+
+
+def _delete_in(connection: Connection, table: Table, column: Column, values: List[int],
+               *criteria) -> None:
+    for start in range(0, len(values), _DELETE_BATCH_SIZE):
+        batch = values[start:start + _DELETE_BATCH_SIZE]
+        connection.execute(table.delete().where(column.in_(batch), *criteria))
+
+
+def _write_fingerprints(connection: Connection, table_name: str, fingerprints: pd.DataFrame,
+                        changed: pd.Index) -> None:
+    _delete_in(connection, row_fingerprint, row_fingerprint.c.row_id, changed.tolist(),
+               row_fingerprint.c.table_name == table_name)
+    if len(fingerprints):
+        connection.execute(row_fingerprint.insert(), [
+            {'table_name': table_name, 'row_id': row_id, PANCAIM_ID: pancaim_id, 'row_hash': row_hash}
+            for row_id, pancaim_id, row_hash in zip(fingerprints.index.tolist(),
+                                                    fingerprints[PANCAIM_ID].tolist(),
+                                                    fingerprints['row_hash'].tolist())])
+
+
+def _delete_fingerprints(connection: Connection, model, previous: pd.DataFrame,
+                         deleted: pd.Index) -> None:
+    if model is Person:
+        # the rows of the other tables were deleted by cascade
+        _delete_in(connection, row_fingerprint, row_fingerprint.c.pancaim_id,
+                   previous.loc[deleted, PANCAIM_ID].tolist())
+    else:
+        _delete_in(connection, row_fingerprint, row_fingerprint.c.row_id, deleted.tolist(),
+                   row_fingerprint.c.table_name == model.__tablename__)
+
+
+def incremental_load(bind: Union[Engine, Connection], model, chunks: Iterable[pd.DataFrame],
+                     delete_missing: bool = True) -> DeltaSummary:
+    """
+    Load only the new and changed rows of a CDM table.
+
+    Compares the fingerprint of each mapped row to the fingerprint stored
+    by the previous load: new rows are bulk loaded, changed rows are
+    updated, and (optionally) rows that are no longer in the source are
+    deleted. Deleting a person deletes its rows in the other tables as
+    well (the foreign keys cascade), including their fingerprints.
+
+    Fingerprints are stored in the row_fingerprint table of the CDM
+    schema (created if needed), and written in the same transaction as
+    the rows, so an interrupted load leaves both unchanged.
+
+    Parameters
+    ----------
+    bind: Engine or Connection
+        Database to load into. An Engine is used in a single transaction;
+        a Connection is used as is (i.e. in its current transaction).
+    model: type
+        PANCAIM CDM model class (e.g. Lab).
+    chunks: iterable of pd.DataFrame
+        All mapped rows of the table, including the primary key and
+        pancaim_id fields, e.g. from `map_chunks`.
+    delete_missing: bool
+        Delete rows that are not in `chunks`. Disable when loading part
+        of a table.
+
+    Returns
+    -------
+    Number of inserted, updated, deleted and unchanged rows.
+    """
+    if isinstance(bind, Engine):
+        with bind.begin() as connection:
+            return incremental_load(connection, model, chunks, delete_missing)
+    table_name = model.__tablename__
+    row_fingerprint.create(bind, checkfirst=True)
+    previous = load_fingerprints(bind, table_name)
+    previous_hashes = previous['row_hash'].to_numpy()
+    summary = DeltaSummary()
+    seen = []
+    for chunk in chunks:
+        if not len(chunk):
+            continue
+        fingerprints = row_fingerprints(model, chunk)
+        seen.append(fingerprints.index.to_numpy())
+        positions = previous.index.get_indexer(fingerprints.index)
+        new = positions == -1
+        changed = np.zeros(len(positions), dtype=bool)
+        changed[~new] = (previous_hashes[positions[~new]]
+                         != fingerprints['row_hash'].to_numpy()[~new])
+        if new.any():
+            bulk_load(bind, model, chunk[new])
+        if changed.any():
+            _update_rows(bind, model, chunk[changed])
+        _write_fingerprints(bind, table_name, fingerprints[new | changed],
+                            fingerprints.index[changed])
+        summary.inserted += int(new.sum())
+        summary.updated += int(changed.sum())
+        summary.unchanged += int((~(new | changed)).sum())
+    if delete_missing:
+        deleted = previous.index
+        if seen:
+            deleted = deleted.difference(np.concatenate(seen))
+        _delete_in(bind, model.__table__, _primary_key(model), deleted.tolist())
+        _delete_fingerprints(bind, model, previous, deleted)
+        summary.deleted = len(deleted)
+    return summary
@@ -0,0 +1,169 @@
+"""Bulk loading of mapped data into the PANCAIM CDM tables."""
+
+import io
+from itertools import islice
+from typing import Any, Iterable, Iterator, List, Mapping, Union
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import Column, Date, Integer, Table
+from sqlalchemy.engine import Connection, Engine
+
+from pancaim_cdm.dtypes import to_dates
+
+Rows = Union[pd.DataFrame, Iterable[Mapping[str, Any]]]
+
+# NULL marker and escapes of the PostgreSQL COPY text format
+_COPY_NULL = '\\N'
+_COPY_ESCAPES = (('\\', '\\\\'), ('\t', '\\t'), ('\n', '\\n'), ('\r', '\\r'))
+
+
+def _chunks(rows: Rows, chunk_size: int) -> Iterator[pd.DataFrame]:
+    # split a DataFrame or an iterable of row mappings in DataFrame chunks
+    if isinstance(rows, pd.DataFrame):
+        for start in range(0, len(rows), chunk_size):
+            yield rows.iloc[start:start + chunk_size]
+        return
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield pd.DataFrame.from_records(chunk)
+
+
+def _load_columns(table: Table, frame: pd.DataFrame) -> List[Column]:
+    # Table columns present in the data, in table order. Columns that are
+    # absent (e.g. autoincrement primary keys) are left to the database.
+    return [column for column in table.columns if column.name in frame.columns]
+
+
+def _escape_copy_value(value: str) -> str:
+    if '\\' in value or '\t' in value or '\n' in value or '\r' in value:
+        for character, escaped in _COPY_ESCAPES:
+            value = value.replace(character, escaped)
+    return value
+
+
+def _integral(values: pd.Series) -> pd.Series:
+    # Integral floats as ints, e.g. of an Integer column with missing
+    # values (float64 in pandas): PostgreSQL rejects '2019.0' as integer.
+    # Python ints for values outside the int64 range, so the database
+    # reports the actual value.
+    if values.dtype.kind == 'f':
+        numbers = values.to_numpy()
+        if ((numbers % 1 == 0) & (np.abs(numbers) < 2 ** 63)).all():
+            return values.astype(np.int64)
+        values = values.astype(object)
+    if values.dtype == object:
+        return values.map(lambda value: int(value)
+                          if isinstance(value, float) and value.is_integer() else value)
+    return values
+
+
+def _copy_values(values: pd.Series, column: Column) -> np.ndarray:
+    # Convert a column to COPY text format values. str() gives input
+    # PostgreSQL accepts for all CDM types (e.g. 'True', '2020-01-31'),
+    # once integral floats of Integer columns are converted to ints, and
+    # partial dates (e.g. '2020-01') of Date columns to full dates.
+    if isinstance(column.type, Date) and values.dtype.kind != 'M':
+        values = to_dates(values)
+    null = values.isna().to_numpy()
+    copy_values = np.full(len(values), _COPY_NULL, dtype=object)
+    if null.all():
+        return copy_values
+    values = values[~null]
+    if isinstance(column.type, Integer) and not isinstance(values.dtype, pd.CategoricalDtype):
+        values = _integral(values)
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # escape each category once
+        categories = _copy_values(values.cat.categories.to_series(), column)
+        text = categories[values.cat.codes.to_numpy()]
+    elif values.dtype.kind == 'M':
+        text = values.dt.strftime('%Y-%m-%d').to_numpy(dtype=object)
+    elif values.dtype.kind in 'biufc':
+        # numbers never need escaping
+        text = values.astype(object).astype(str).to_numpy(dtype=object)
+    elif pd.api.types.infer_dtype(values, skipna=True) == 'string':
+        # escape each distinct string once
+        codes, uniques = pd.factorize(values)
+        text = np.array([_escape_copy_value(value) for value in uniques], dtype=object)[codes]
+    else:
+        text = np.array([_escape_copy_value(str(value)) for value in values], dtype=object)
+    copy_values[~null] = text
+    return copy_values
+
+
+def _copy_chunk(connection: Connection, table: Table, frame: pd.DataFrame) -> None:
+    columns = _load_columns(table, frame)
+    preparer = connection.dialect.identifier_preparer
+    column_list = ', '.join(preparer.quote(column.name) for column in columns)
+    statement = f'COPY {preparer.format_table(table)} ({column_list}) FROM STDIN'
+    lines = map('\t'.join, zip(*[_copy_values(frame[column.name], column)
+                                            for column in columns]))
+    buffer = io.StringIO()
+    for line in lines:
+        buffer.write(line)
+        buffer.write('\n')
+    buffer.seek(0)
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert(statement, buffer)
+    finally:
+        cursor.close()
+
+
+def _insert_chunk(connection: Connection, table: Table, frame: pd.DataFrame) -> None:
+    columns = _load_columns(table, frame)
+    frame = frame[[column.name for column in columns]].astype(object)
+    frame = frame.where(frame.notna(), None)
+    for column in columns:
+        if isinstance(column.type, Date):
+            # SQLAlchemy Date columns only accept date objects on some backends
+            frame[column.name] = to_dates(frame[column.name])
+    connection.execute(table.insert(), frame.to_dict('records'))
+
+
+def supports_copy(connection: Connection) -> bool:
+    """Return True if the connection can load data with PostgreSQL COPY."""
+    return connection.dialect.name == 'postgresql' and connection.dialect.driver == 'psycopg2'
+
+
+def bulk_load(bind: Union[Engine, Connection], model, rows: Rows,
+              chunk_size: int = 50_000) -> int:
+    """
+    Load rows into the table of a PANCAIM CDM model.
+
+    Uses PostgreSQL ``COPY FROM STDIN`` when available, and falls back to
+    a SQLAlchemy Core ``INSERT`` executed with many parameter sets
+    otherwise. Column names and order are taken from the model table;
+    table columns missing from the data (e.g. autoincrement primary keys)
+    are left to the database.
+
+    Parameters
+    ----------
+    bind: Engine or Connection
+        Database to load into. An Engine is used in a single transaction;
+        a Connection is used as is (i.e. in its current transaction).
+    model: type
+        PANCAIM CDM model class (e.g. Lab).
+    rows: pd.DataFrame or iterable of mappings
+        Rows to load, with keys or columns named after the table fields.
+    chunk_size: int
+        Number of rows sent to the database at once.
+
+    Returns
+    -------
+    Number of rows loaded.
+    """
+    if isinstance(bind, Engine):
+        with bind.begin() as connection:
+            return bulk_load(connection, model, rows, chunk_size)
+    table = model.__table__
+    load_chunk = _copy_chunk if supports_copy(bind) else _insert_chunk
+    row_count = 0
+    for frame in _chunks(rows, chunk_size):
+        if len(frame):
+            load_chunk(bind, table, frame)
+            row_count += len(frame)
+    return row_count
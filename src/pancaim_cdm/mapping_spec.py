@@ -0,0 +1,262 @@
+"""Declarative (JSON / YAML) mapping specifications, compiled to table mappings."""
+
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+from enum import Enum
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Type, Union
+
+from pancaim_cdm.pancaim_orm import Base
+from pancaim_cdm.pipeline import TableMapping
+from pancaim_cdm.semantic_mapping import SemanticMapper
+from pancaim_cdm.semantic_mapping.controlled_terms import controlled_term_index
+from pancaim_cdm.semantic_mapping.date_format.date_format import DateFormat
+
+# allowed keys of a table and a field specification
+_TABLE_KEYS = {'copy_columns', 'compact_dtypes', 'fields'}
+_FIELD_KEYS = {'source', 'mappings', 'date_formats', 'cache_size', 'fuzzy_matching',
+               'min_similarity', 'coerce_types', 'factorize'}
+
+
+class MappingSpecError(ValueError):
+    """Raised for an invalid mapping specification, listing all errors found."""
+
+    def __init__(self, errors: List[str]):
+        self.errors = errors
+        super().__init__('Invalid mapping specification:\n' + '\n'.join(f'- {error}' for error in errors))
+
+
+def _models() -> Dict[str, type]:
+    return {mapper.class_.__tablename__: mapper.class_ for mapper in Base.registry.mappers}
+
+
+def _enum_member(enum: Type[Enum], target: Any) -> Enum:
+    # targets are given by Enum member name (e.g. M) or value (e.g. Male)
+    if isinstance(target, str) and target in enum.__members__:
+        return enum[target]
+    return enum(target)
+
+
+def read_mapping_spec(path: Union[str, Path]) -> Dict:
+    """
+    Read a mapping specification from a JSON or YAML (.yml, .yaml) file.
+
+    YAML files require PyYAML. Keys are read as written, e.g. source
+    values yes and 01 as 'yes' and '01' (rather than True and 1).
+    """
+    path = Path(path)
+    with open(path, encoding='utf-8') as file:
+        if path.suffix.lower() in ('.yml', '.yaml'):
+            import yaml
+            return yaml.load(file, Loader=_yaml_loader())
+        return json.load(file)
+
+
+def _yaml_loader() -> type:
+    import yaml
+
+    class MappingSpecLoader(yaml.SafeLoader):
+        # Read mapping keys as written, e.g. 01 and yes as the source values
+        # '01' and 'yes' rather than 1 and True (which would collide with 1);
+        # null (or ~) keys still map missing values.
+
+        def construct_mapping(self, node, deep=False):
+            for key_node, _ in node.value:
+                if isinstance(key_node, yaml.ScalarNode) and key_node.tag not in (
+                        'tag:yaml.org,2002:null', 'tag:yaml.org,2002:merge'):
+                    key_node.tag = 'tag:yaml.org,2002:str'
+            return super().construct_mapping(node, deep)
+
+    return MappingSpecLoader
+
+
+def _source_value(source_value: Any, location: str, errors: List[str]) -> Optional[str]:
+    # Source values are matched as (cleaned) strings. YAML parses unquoted
+    # keys such as 1 or 2.5 as numbers, which are converted back; keys such
+    # as yes, off or 2020-01-01 are parsed as booleans and dates, which
+    # cannot be converted back reliably and have to be quoted.
+    if source_value is None or isinstance(source_value, str):
+        return source_value
+    if isinstance(source_value, (int, float)) and not isinstance(source_value, bool):
+        return str(source_value)
+    errors.append(f'{location}: source value {source_value!r} is not a string, quote it '
+                  f'(e.g. \'yes\': instead of yes:)')
+    return str(source_value)
+
+
+def _compile_date_formats(date_formats: Dict, location: str, errors: List[str]) \
+        -> Dict[str, DateFormat]:
+    compiled = {}
+    for input_format, output_format in date_formats.items():
+        try:
+            compiled[str(input_format)] = _enum_member(DateFormat, output_format)
+        except ValueError:
+            errors.append(f'{location}: unknown date format {output_format!r}')
+    return compiled
+
+
+def _compile_field(model, field_name: str, field_spec: Dict, date_formats: Dict,
+                   errors: List[str]) -> Optional[SemanticMapper]:
+    table_name = model.__tablename__
+    location = f'{table_name}.{field_name}'
+    if field_name not in model.__table__.columns:
+        errors.append(f'{location}: not a field of table {table_name}')
+        return None
+    unknown_keys = set(field_spec) - _FIELD_KEYS
+    if unknown_keys:
+        errors.append(f'{location}: unknown keys {", ".join(sorted(unknown_keys))}')
+    if 'source' not in field_spec:
+        errors.append(f'{location}: no source column')
+    mappings = {}
+    is_controlled_term = (table_name, field_name) in controlled_term_index()
+    for source_value, target in (field_spec.get('mappings') or {}).items():
+        source_value = _source_value(source_value, location, errors)
+        if source_value in mappings:
+            errors.append(f'{location}: source value {source_value!r} is mapped more than once')
+        if is_controlled_term:
+            enum = controlled_term_index().enum(table_name, field_name)
+            try:
+                target = None if target is None else _enum_member(enum, target)
+            except ValueError:
+                errors.append(f'{location}: {target!r} is not a controlled term of {enum.__name__}')
+        mappings[source_value] = target
+    if 'date_formats' in field_spec:
+        date_formats = _compile_date_formats(field_spec['date_formats'], location, errors)
+    try:
+        return SemanticMapper(model.__table__.columns[field_name],
+                              mappings,
+                              date_formats=date_formats or None,
+                              cache_size=field_spec.get('cache_size'),
+                              fuzzy_matching=field_spec.get('fuzzy_matching', False),
+                              min_similarity=field_spec.get('min_similarity', 0.7),
+                              coerce_types=field_spec.get('coerce_types', False),
+                              factorize=field_spec.get('factorize', False))
+    except (TypeError, ValueError) as error:
+        errors.append(f'{location}: {error}')
+        return None
+
+
+def compile_mapping_spec(spec: Dict) -> Dict[str, TableMapping]:
+    """
+    Validate a mapping specification and compile it to table mappings.
+
+    A specification has optional shared `date_formats` (source date
+    format : DateFormat name or value) and a `tables` dictionary. Each
+    table (e.g. person) has `fields`: target field : field specification
+    with a `source` column and optional `mappings` (source value : target
+    value, given by controlled term Enum member name or value),
+    `date_formats`, `cache_size`, `fuzzy_matching`, `min_similarity`,
+    `coerce_types` and `factorize` (see SemanticMapper). A table may also have
+    `copy_columns` (source column : target field) and `compact_dtypes`
+    (see TableMapping).
+
+    Parameters
+    ----------
+    spec: dict
+        Mapping specification, e.g. from `read_mapping_spec`.
+
+    Returns
+    -------
+    Dictionary of table name : TableMapping.
+
+    Raises
+    ------
+    MappingSpecError
+        If the specification does not match the data model.
+    """
+    errors: List[str] = []
+    models = _models()
+    unknown_keys = set(spec) - {'date_formats', 'tables'}
+    if unknown_keys:
+        errors.append(f'unknown keys {", ".join(sorted(unknown_keys))}')
+    date_formats = _compile_date_formats(spec.get('date_formats') or {}, 'date_formats', errors)
+    table_mappings = {}
+    for table_name, table_spec in (spec.get('tables') or {}).items():
+        if table_name not in models:
+            errors.append(f'{table_name}: not a CDM table')
+            continue
+        model = models[table_name]
+        unknown_keys = set(table_spec) - _TABLE_KEYS
+        if unknown_keys:
+            errors.append(f'{table_name}: unknown keys {", ".join(sorted(unknown_keys))}')
+        copy_columns = dict(table_spec.get('copy_columns') or {})
+        for field_name in copy_columns.values():
+            if field_name not in model.__table__.columns:
+                errors.append(f'{table_name}.{field_name}: not a field of table {table_name}')
+        mappers = {}
+        for field_name, field_spec in (table_spec.get('fields') or {}).items():
+            field_spec = field_spec or {}
+            mapper = _compile_field(model, field_name, field_spec, date_formats, errors)
+            source = field_spec.get('source')
+            if source in mappers:
+                errors.append(f'{table_name}.{field_name}: source column {source!r} is already '
+                              f'mapped to {mappers[source].field_name}')
+            elif mapper is not None and source is not None:
+                mappers[source] = mapper
+        table_mappings[table_name] = TableMapping(model, mappers, copy_columns,
+                                                  compact_dtypes=table_spec.get('compact_dtypes', False))
+    if errors:
+        raise MappingSpecError(errors)
+    return table_mappings
+
+
+def _spec_hash(spec: Dict) -> str:
+    import importlib.metadata
+
+    import pancaim_cdm
+    try:
+        version = pancaim_cdm.__version__
+    except importlib.metadata.PackageNotFoundError:
+        # e.g. running from a source checkout that is not installed
+        version = 'unknown'
+    content = json.dumps(spec, sort_keys=True, default=str) + version
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def load_mapping_spec(spec: Union[str, Path, Dict], cache_dir: Union[str, Path, None] = None) \
+        -> Dict[str, TableMapping]:
+    """
+    Load compiled table mappings, compiling the specification only once.
+
+    The compiled table mappings (incl. their lookup structures) are
+    pickled to the cache directory, keyed by the hash of the
+    specification and the package version. Later loads (e.g. at worker
+    start-up) unpickle them, which skips validation and construction.
+
+    Parameters
+    ----------
+    spec: str, Path or dict
+        Mapping specification, or a JSON / YAML file containing it.
+    cache_dir: str or Path, optional
+        Directory for compiled specifications (default: no caching).
+
+    Returns
+    -------
+    Dictionary of table name : TableMapping.
+    """
+    if not isinstance(spec, dict):
+        spec = read_mapping_spec(spec)
+    if cache_dir is None:
+        return compile_mapping_spec(spec)
+    cache_path = Path(cache_dir) / f'mapping-{_spec_hash(spec)}.pickle'
+    try:
+        with open(cache_path, 'rb') as file:
+            return pickle.load(file)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        # not cached yet, or stale (e.g. written by another version)
+        pass
+    table_mappings = compile_mapping_spec(spec)
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    # write to a temporary file first, so concurrent readers never see a partial file
+    file_descriptor, temporary_path = tempfile.mkstemp(dir=cache_path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(file_descriptor, 'wb') as file:
+            pickle.dump(table_mappings, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, cache_path)
+    except BaseException:
+        os.unlink(temporary_path)
+        raise
+    return table_mappings
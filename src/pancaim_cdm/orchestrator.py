@@ -0,0 +1,242 @@
+"""Resumable, concurrent mapping and loading of the CDM tables of several sites."""
+
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Set, Tuple
+
+import pandas as pd
+from sqlalchemy import Column, DateTime, Integer, MetaData, Table, Text, func, select
+from sqlalchemy.engine import Connection, Engine
+
+from pancaim_cdm.loader import bulk_load
+from pancaim_cdm.pancaim_orm import CDM_SCHEMA, Base
+from pancaim_cdm.pipeline import TableMapping
+
+# (site name, table name)
+Unit = Tuple[str, str]
+
+# chunk number marking a completely loaded table
+_TABLE_DONE = -1
+
+# Not part of the ORM metadata, so that create_all does not create it;
+# stored in the database loaded into, so a chunk and its checkpoint are
+# committed in the same transaction
+_metadata = MetaData()
+load_checkpoint = Table(
+    'load_checkpoint', _metadata,
+    Column('site', Text, primary_key=True),
+    Column('table_name', Text, primary_key=True),
+    Column('chunk', Integer, primary_key=True, autoincrement=False),
+    Column('row_count', Integer, nullable=False),
+    Column('completed_at', DateTime, nullable=False, server_default=func.now()),
+    schema=CDM_SCHEMA,
+)
+
+
+class CheckpointManifest:
+    """
+    Manifest of the loaded chunks of each site and table.
+
+    The manifest is a table (load_checkpoint) in the database the chunks
+    are loaded into, so a chunk is recorded in the same transaction as
+    it is loaded: a crash either loses both, or keeps both.
+
+    Attributes
+    ----------
+    engine: Engine
+        Database with the CDM tables (the CDM schema has to exist).
+    """
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        load_checkpoint.create(engine, checkfirst=True)
+
+    def completed_chunks(self, site: str, table_name: str) -> Dict[int, int]:
+        """Return a dictionary of chunk number : row count of the loaded chunks of a table."""
+        query = select(load_checkpoint.c.chunk, load_checkpoint.c.row_count).where(
+            load_checkpoint.c.site == site,
+            load_checkpoint.c.table_name == table_name,
+            load_checkpoint.c.chunk >= 0)
+        with self.engine.connect() as connection:
+            return dict(connection.execute(query).fetchall())
+
+    def is_complete(self, site: str, table_name: str) -> bool:
+        """Return True if all chunks of a table were loaded."""
+        query = select(load_checkpoint.c.chunk).where(
+            load_checkpoint.c.site == site,
+            load_checkpoint.c.table_name == table_name,
+            load_checkpoint.c.chunk == _TABLE_DONE)
+        with self.engine.connect() as connection:
+            return connection.execute(query).first() is not None
+
+    @staticmethod
+    def complete_chunk(connection: Connection, site: str, table_name: str, chunk: int,
+                       row_count: int) -> None:
+        """Record a loaded chunk, in the transaction of the connection that loaded it."""
+        connection.execute(load_checkpoint.insert().values(
+            site=site, table_name=table_name, chunk=chunk, row_count=row_count))
+
+    def complete_table(self, site: str, table_name: str) -> None:
+        """Record that all chunks of a table were loaded."""
+        with self.engine.begin() as connection:
+            self.complete_chunk(connection, site, table_name, _TABLE_DONE, 0)
+
+    def reset(self, site: str) -> None:
+        """Forget all checkpoints of a site (e.g. to reload it from scratch)."""
+        with self.engine.begin() as connection:
+            connection.execute(load_checkpoint.delete().where(load_checkpoint.c.site == site))
+
+
+@dataclass
+class Site:
+    """
+    Source data of one site, and where to load it.
+
+    Attributes
+    ----------
+    name: str
+        Unique name of the site.
+    table_mappings: dict[str, TableMapping]
+        Dictionary of table name : mappers for the table.
+    sources: dict[str, callable]
+        Dictionary of table name : function returning the source chunks
+        of the table (e.g. ``functools.partial(read_source_chunks, path)``).
+        Chunks must be returned in the same order on every call, so a
+        resumed run can skip the loaded chunks.
+    engine: Engine
+        Database to load into (see `create_loading_engine`); sites may
+        share a database.
+    load: callable
+        Called with a Connection (in the transaction recording the
+        chunk), the model and each mapped chunk; `bulk_load` by default.
+    """
+    name: str
+    table_mappings: Dict[str, TableMapping]
+    sources: Dict[str, Callable[[], Iterable[pd.DataFrame]]]
+    engine: Engine
+    load: Callable[[Connection, Any, pd.DataFrame], Any] = bulk_load
+
+
+class OrchestrationError(RuntimeError):
+    """Raised when tables of one or more sites failed to load."""
+
+    def __init__(self, errors: Dict[Unit, BaseException]):
+        self.errors = errors
+        failed = ', '.join(f'{site}.{table_name} ({error!r})'
+                           for (site, table_name), error in errors.items())
+        super().__init__(f'Failed to load: {failed}')
+
+
+def _references(table_name: str) -> Set[str]:
+    # CDM tables referenced by the foreign keys of a table
+    table = next(table for table in Base.metadata.sorted_tables if table.name == table_name)
+    return {foreign_key.column.table.name for foreign_key in table.foreign_keys}
+
+
+class Orchestrator:
+    """
+    Map and load the CDM tables of several sites, resuming where a previous run stopped.
+
+    The tables of all sites form a dependency graph: a table is loaded
+    once the tables it references (e.g. person) are loaded for the same
+    site. Tables whose dependencies are loaded, of any site, run
+    concurrently, up to `max_workers` at a time. Every chunk is loaded
+    and recorded in the manifest of its site in a single transaction, so
+    a run that crashed skips exactly the chunks and tables it loaded.
+
+    Attributes
+    ----------
+    sites: list[Site]
+        Sites to load.
+    max_workers: int
+        Maximum number of tables loaded concurrently.
+    """
+
+    def __init__(self, sites: List[Site], max_workers: int = 4):
+        if len({site.name for site in sites}) != len(sites):
+            raise ValueError('Site names must be unique')
+        self.sites = {site.name: site for site in sites}
+        self.max_workers = max_workers
+        # manifest of each site, one per database
+        manifests: Dict[int, CheckpointManifest] = {}
+        self.manifests: Dict[str, CheckpointManifest] = {}
+        for site in sites:
+            if id(site.engine) not in manifests:
+                manifests[id(site.engine)] = CheckpointManifest(site.engine)
+            self.manifests[site.name] = manifests[id(site.engine)]
+
+    def _run_table(self, site: Site, table_name: str) -> int:
+        manifest = self.manifests[site.name]
+        table_mapping = site.table_mappings[table_name]
+        completed = manifest.completed_chunks(site.name, table_name)
+        row_count = 0
+        for number, chunk in enumerate(site.sources[table_name]()):
+            if number in completed:
+                row_count += completed[number]
+                continue
+            mapped_chunk = table_mapping.map_chunk(chunk)
+            with site.engine.begin() as connection:
+                site.load(connection, table_mapping.model, mapped_chunk)
+                manifest.complete_chunk(connection, site.name, table_name, number, len(mapped_chunk))
+            row_count += len(mapped_chunk)
+        manifest.complete_table(site.name, table_name)
+        return row_count
+
+    def run(self) -> Dict[Unit, int]:
+        """
+        Load all tables of all sites that are not loaded yet.
+
+        Returns
+        -------
+        Dictionary of (site, table name) : number of rows, for the tables
+        loaded (or skipped as complete) in this run.
+
+        Raises
+        ------
+        OrchestrationError
+            If any table failed to load. The other sites are still
+            loaded; tables depending on a failed table are not.
+        """
+        dependencies: Dict[Unit, Set[Unit]] = {}
+        for site in self.sites.values():
+            for table_name in site.sources:
+                dependencies[(site.name, table_name)] = {
+                    (site.name, reference) for reference in _references(table_name)
+                    if reference in site.sources}
+        done: Set[Unit] = set()
+        row_counts: Dict[Unit, int] = {}
+        errors: Dict[Unit, BaseException] = {}
+        # failed tables, and the tables depending on them
+        skipped: Set[Unit] = set()
+        running: Dict[Future, Unit] = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while dependencies or running:
+                for unit, required in list(dependencies.items()):
+                    if required & skipped:
+                        del dependencies[unit]
+                        skipped.add(unit)
+                        continue
+                    if not required <= done:
+                        continue
+                    del dependencies[unit]
+                    site_name, table_name = unit
+                    manifest = self.manifests[site_name]
+                    if manifest.is_complete(site_name, table_name):
+                        done.add(unit)
+                        row_counts[unit] = sum(manifest.completed_chunks(site_name, table_name).values())
+                        continue
+                    running[executor.submit(self._run_table, self.sites[site_name], table_name)] = unit
+                if not running:
+                    continue
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    unit = running.pop(future)
+                    try:
+                        row_counts[unit] = future.result()
+                        done.add(unit)
+                    except Exception as error:
+                        errors[unit] = error
+                        skipped.add(unit)
+        if errors:
+            raise OrchestrationError(errors)
+        return row_counts
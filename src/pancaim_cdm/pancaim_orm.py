@@ -1,7 +1,7 @@
 from dataclasses import dataclass
 from types import SimpleNamespace
 
-from sqlalchemy import Column, Integer, Text, Numeric, Date, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, Text, Numeric, Date, Boolean, ForeignKey, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
@@ -21,6 +21,13 @@ class Table:
     fields: SimpleNamespace
 
 
+def _patient_date_index(table: Table, date_field: str) -> Index:
+    # Index on (pancaim_id, date) of event tables, for the events of a
+    # patient in date order (e.g. timelines) without scanning the table.
+    return Index(f'ix_{table.name}_{table.fields.pancaim_id}_{date_field}',
+                 table.fields.pancaim_id, date_field)
+
+
 _person = Table(
     name='person',
     fields=SimpleNamespace(
@@ -281,7 +288,10 @@ class Person(Base):
 
 class BodyMeasurement(Base):
     __tablename__ = _body_measurement.name
-    __table_args__ = {'schema': CDM_SCHEMA}
+    __table_args__ = (
+        _patient_date_index(_body_measurement, _body_measurement.fields.body_measurement_date),
+        {'schema': CDM_SCHEMA},
+    )
 
     body_measurement_id = Column(Integer, primary_key=True, name=_body_measurement.fields.body_measurement_id)
 
@@ -302,7 +312,10 @@ class BodyMeasurement(Base):
 
 class Lab(Base):
     __tablename__ = _lab.name
-    __table_args__ = {'schema': CDM_SCHEMA}
+    __table_args__ = (
+        _patient_date_index(_lab, _lab.fields.lab_date),
+        {'schema': CDM_SCHEMA},
+    )
 
     lab_id = Column(Integer, primary_key=True, name=_lab.fields.lab_id)
 
@@ -353,7 +366,10 @@ class Lab(Base):
 
 class Lab2(Base):
     __tablename__ = _lab2.name
-    __table_args__ = {'schema': CDM_SCHEMA}
+    __table_args__ = (
+        _patient_date_index(_lab2, _lab2.fields.lab2_date),
+        {'schema': CDM_SCHEMA},
+    )
 
     lab2_id = Column(Integer, primary_key=True, name=_lab2.fields.lab2_id)
 
@@ -374,7 +390,10 @@ class Lab2(Base):
 
 class Prognosis(Base):
     __tablename__ = _prognosis.name
-    __table_args__ = {'schema': CDM_SCHEMA}
+    __table_args__ = (
+        _patient_date_index(_prognosis, _prognosis.fields.prognosis_date),
+        {'schema': CDM_SCHEMA},
+    )
 
     prognosis_id = Column(Integer, primary_key=True, name=_prognosis.fields.prognosis_id)
 
@@ -395,7 +414,10 @@ class Prognosis(Base):
 
 class Surgery(Base):
     __tablename__ = _surgery.name
-    __table_args__ = {'schema': CDM_SCHEMA}
+    __table_args__ = (
+        _patient_date_index(_surgery, _surgery.fields.date_of_surgery),
+        {'schema': CDM_SCHEMA},
+    )
 
     surgery_id = Column(Integer, primary_key=True, name=_surgery.fields.surgery_id)
 
@@ -417,7 +439,10 @@ class Surgery(Base):
 
 class Therapy(Base):
     __tablename__ = _therapy.name
-    __table_args__ = {'schema': CDM_SCHEMA}
+    __table_args__ = (
+        _patient_date_index(_therapy, _therapy.fields.date_start_adjuvant_chemotherapy),
+        {'schema': CDM_SCHEMA},
+    )
 
     therapy_id = Column(Integer, primary_key=True, name=_therapy.fields.therapy_id)
 
@@ -445,7 +470,10 @@ class Therapy(Base):
 
 class Tumor(Base):
     __tablename__ = _tumor.name
-    __table_args__ = {'schema': CDM_SCHEMA}
+    __table_args__ = (
+        _patient_date_index(_tumor, _tumor.fields.tumor_date),
+        {'schema': CDM_SCHEMA},
+    )
 
     tumor_id = Column(Integer, primary_key=True, name=_tumor.fields.tumor_id)
 
@@ -0,0 +1,222 @@
+"""Chunked mapping of source extracts to PANCAIM CDM tables."""
+
+import threading
+from queue import Full, Queue
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, TypeVar
+
+import pandas as pd
+
+from pancaim_cdm.dtypes import compact
+from pancaim_cdm.semantic_mapping import SemanticMapper
+from pancaim_cdm.semantic_mapping.statistics import StatisticsRegistry
+
+T = TypeVar('T')
+
+# marks the end of a prefetched iterable
+_END = object()
+
+
+class TableMapping:
+    """
+    Collection of semantic mappers for the fields of one CDM table.
+
+    Attributes
+    ----------
+    model: type
+        PANCAIM CDM model class (e.g. Person).
+    mappers: dict[str, SemanticMapper]
+        Dictionary of source column : semantic mapper for a target field.
+        Each mapped field is emitted with its raw value column, if the
+        table has one.
+    copy_columns: dict[str, str]
+        Dictionary of source column : target field, for values that are
+        copied without mapping (e.g. pancaim_id).
+    compact_dtypes: bool
+        If True, mapped chunks use compact dtypes (see `dtypes.compact`):
+        categorical controlled terms, (Arrow) strings and nullable
+        numbers and dates, instead of columns of Python objects.
+    """
+
+    def __init__(self,
+                 model,
+                 mappers: Dict[str, SemanticMapper],
+                 copy_columns: Optional[Dict[str, str]] = None,
+                 compact_dtypes: bool = False):
+        self.model = model
+        self.mappers = mappers
+        self.copy_columns = copy_columns or {}
+        self.compact_dtypes = compact_dtypes
+
+    @property
+    def source_columns(self) -> List[str]:
+        """Source columns needed to map the table."""
+        return list(dict.fromkeys([*self.copy_columns, *self.mappers]))
+
+    def enable_statistics(self, registry: Optional[StatisticsRegistry] = None,
+                          unmapped_values: int = 0) -> None:
+        """
+        Collect mapping statistics for all fields of the table.
+
+        See `SemanticMapper.enable_statistics`; e.g. profile the unmapped
+        values of a run and print ``registry.report()`` at the end.
+        """
+        for mapper in self.mappers.values():
+            mapper.enable_statistics(registry, unmapped_values)
+
+    def map_chunk(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        """
+        Map a chunk of source data to the fields of the table.
+
+        Parameters
+        ----------
+        chunk: pd.DataFrame
+            Source data, containing (at least) the source columns.
+
+        Returns
+        -------
+        DataFrame of target fields (and raw value columns), with the
+        index of the source chunk.
+        """
+        columns = {}
+        for source_column, field in self.copy_columns.items():
+            column = chunk[source_column]
+            if isinstance(column.dtype, pd.CategoricalDtype):
+                # dictionary-encoded (e.g. by read_arrow_source_chunks)
+                column = column.astype(object)
+            columns[field] = column
+        for source_column, mapper in self.mappers.items():
+            if mapper.raw_field_name is None:
+                columns[mapper.field_name] = mapper.map_series(chunk[source_column])
+            else:
+                mapped = mapper.map_series(chunk[source_column], raw_values=True)
+                columns.update(mapped.items())
+        mapped_chunk = pd.DataFrame(columns, index=chunk.index)
+        if self.compact_dtypes:
+            return compact(self.model, mapped_chunk)
+        return mapped_chunk
+
+
+def prefetch(iterable: Iterable[T], size: int = 1) -> Iterator[T]:
+    """
+    Iterate in a background thread, keeping up to `size` items ready.
+
+    Lets the producer of the items (e.g. file I/O) overlap with their
+    consumer (e.g. mapping). Exceptions raised by the producer are
+    re-raised in the consuming thread.
+
+    Parameters
+    ----------
+    iterable: iterable
+        Items to produce in the background.
+    size: int
+        Maximum number of items produced ahead of the consumer.
+    """
+    queue: Queue = Queue(maxsize=size)
+    stopped = threading.Event()
+
+    def put(item) -> bool:
+        # block until there is room, unless the consumer has stopped
+        while not stopped.is_set():
+            try:
+                queue.put(item, timeout=0.1)
+                return True
+            except Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+            put((_END, None))
+        except BaseException as error:
+            put((_END, error))
+
+    thread = threading.Thread(target=produce, name='pancaim-cdm-prefetch', daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = queue.get()
+            if error is not None:
+                raise error
+            if item is _END:
+                return
+            yield item
+    finally:
+        stopped.set()
+
+
+def read_source_chunks(path, chunk_size: int = 100_000, **read_csv_kwargs) \
+        -> Iterator[pd.DataFrame]:
+    """
+    Read a delimited source file in chunks of a fixed number of rows.
+
+    Values are read as strings (i.e. not converted by pandas), as they
+    are cleaned and mapped by the semantic mappers. Only empty values
+    are missing values: markers such as 'NA' or 'null' are kept, so they
+    can be mapped, and are kept as raw value.
+
+    Parameters
+    ----------
+    path: str or Path
+        Source file.
+    chunk_size: int
+        Number of rows per chunk.
+    read_csv_kwargs:
+        Additional arguments for `pandas.read_csv` (e.g. sep, usecols).
+    """
+    read_csv_kwargs.setdefault('dtype', str)
+    read_csv_kwargs.setdefault('keep_default_na', False)
+    read_csv_kwargs.setdefault('na_values', [''])
+    with pd.read_csv(path, chunksize=chunk_size, **read_csv_kwargs) as reader:
+        yield from reader
+
+
+def map_chunks(chunks: Iterable[pd.DataFrame], table_mapping: TableMapping) \
+        -> Iterator[pd.DataFrame]:
+    """Map source chunks to the fields of a CDM table, one chunk at a time."""
+    for chunk in chunks:
+        yield table_mapping.map_chunk(chunk)
+
+
+def run_pipeline(chunks: Iterable[pd.DataFrame],
+                 table_mapping: TableMapping,
+                 sink: Callable[[pd.DataFrame], Any],
+                 prefetch_size: int = 1) -> int:
+    """
+    Map source chunks to a CDM table and pass each mapped chunk to a sink.
+
+    Only `prefetch_size` + 1 source chunks are held in memory at a time,
+    regardless of the size of the source. Reading the next source chunk
+    overlaps with mapping the current one.
+
+    Parameters
+    ----------
+    chunks: iterable of pd.DataFrame
+        Source chunks, e.g. from `read_source_chunks`.
+    table_mapping: TableMapping
+        Mappers for the target table.
+    sink: callable
+        Called with every mapped chunk, e.g.
+        ``functools.partial(bulk_load, engine, Lab)``.
+    prefetch_size: int
+        Number of source chunks read ahead in the background (0 to
+        read in the calling thread).
+
+    Returns
+    -------
+    Number of mapped rows.
+    """
+    if prefetch_size > 0:
+        prefetched = prefetch(chunks, prefetch_size)
+        try:
+            return run_pipeline(prefetched, table_mapping, sink, prefetch_size=0)
+        finally:
+            # stop the background thread, also if the sink failed
+            prefetched.close()
+    row_count = 0
+    for mapped_chunk in map_chunks(chunks, table_mapping):
+        sink(mapped_chunk)
+        row_count += len(mapped_chunk)
+    return row_count
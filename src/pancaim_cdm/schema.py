@@ -0,0 +1,90 @@
+"""Creation of the CDM schema, optionally in bulk load mode."""
+
+from contextlib import contextmanager
+from typing import Iterator, Union
+
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.schema import AddConstraint, CreateIndex, CreateSchema, CreateTable
+
+from pancaim_cdm.pancaim_orm import CDM_SCHEMA, Base
+
+
+def create_schema(bind: Union[Engine, Connection], bulk_load_mode: bool = False) -> None:
+    """
+    Create the CDM schema and tables.
+
+    In bulk load mode, the tables are created without foreign keys and
+    secondary indexes, so loading rows does not pay for constraint checks
+    and index maintenance. Call `finalize_schema` after loading. Bulk
+    load mode requires an empty schema; otherwise, existing tables are
+    left as they are.
+
+    Parameters
+    ----------
+    bind: Engine or Connection
+        Database to create the schema in. An Engine is used in a single
+        transaction; a Connection is used as is.
+    bulk_load_mode: bool
+        Defer foreign keys and secondary indexes.
+    """
+    if isinstance(bind, Engine):
+        with bind.begin() as connection:
+            return create_schema(connection, bulk_load_mode)
+    if bind.dialect.name == 'postgresql' and not bind.dialect.has_schema(bind, CDM_SCHEMA):
+        bind.execute(CreateSchema(CDM_SCHEMA))
+    for table in Base.metadata.sorted_tables:
+        if bind.dialect.has_table(bind, table.name, schema=table.schema):
+            if bulk_load_mode:
+                raise ValueError(f'Bulk load mode requires an empty schema, table exists: '
+                                 f'{table.schema}.{table.name}')
+            continue
+        if bulk_load_mode:
+            bind.execute(CreateTable(table, include_foreign_key_constraints=[]))
+        else:
+            table.create(bind)
+
+
+def finalize_schema(bind: Union[Engine, Connection]) -> None:
+    """
+    Build the secondary indexes and foreign keys deferred by bulk load mode.
+
+    The secondary indexes are the indexes declared in the data model
+    (e.g. on pancaim_id and date of the event tables). Each index is
+    built, and each foreign key validated, in a single pass over the
+    loaded table. On PostgreSQL, the tables are analyzed afterwards, so
+    the query planner knows their new size. Adding foreign keys to
+    existing tables requires ``ALTER TABLE ... ADD CONSTRAINT``
+    support (e.g. PostgreSQL; not SQLite).
+
+    Parameters
+    ----------
+    bind: Engine or Connection
+        Database with a schema created in bulk load mode.
+    """
+    if isinstance(bind, Engine):
+        with bind.begin() as connection:
+            return finalize_schema(connection)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            bind.execute(CreateIndex(index))
+        for constraint in table.foreign_key_constraints:
+            bind.execute(AddConstraint(constraint))
+    if bind.dialect.name == 'postgresql':
+        preparer = bind.dialect.identifier_preparer
+        for table in Base.metadata.sorted_tables:
+            bind.exec_driver_sql(f'ANALYZE {preparer.format_table(table)}')
+
+
+@contextmanager
+def bulk_load_schema(bind: Union[Engine, Connection]) -> Iterator[None]:
+    """
+    Create the CDM schema in bulk load mode, and finalize it after loading.
+
+    Example::
+
+        with bulk_load_schema(engine):
+            load_tables(engine, table_mappings, sources)
+    """
+    create_schema(bind, bulk_load_mode=True)
+    yield
+    finalize_schema(bind)
@@ -1 +1,14 @@
-from pancaim_cdm.semantic_mapping.semantic_mapper import SemanticMapper
+# SemanticMapper is imported on first access, so the controlled term and
+# date format Enums can be imported without loading the mapping machinery
+__all__ = ['SemanticMapper']
+
+
+def __getattr__(name):
+    if name == 'SemanticMapper':
+        from pancaim_cdm.semantic_mapping.semantic_mapper import SemanticMapper
+        return SemanticMapper
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+def __dir__():
+    return sorted([*globals(), *__all__])
@@ -1 +1,3 @@
 """Enums specifying the values for all controlled term variables."""
+
+from pancaim_cdm.semantic_mapping.controlled_terms.registry import ControlledTermIndex, controlled_term_index
@@ -0,0 +1,113 @@
+import importlib
+import inspect
+import pkgutil
+import re
+from enum import Enum
+from functools import lru_cache
+from typing import TYPE_CHECKING, Dict, FrozenSet, Iterator, Tuple, Type
+
+from pancaim_cdm.semantic_mapping.unmapped_value import UNMAPPED_VALUE
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# (table name, field name)
+FieldKey = Tuple[str, str]
+
+
+def _field_name(enum: Type[Enum]) -> str:
+    # Enum class names are the CamelCase field names (e.g. VitalStatus)
+    return re.sub(r'(?<!^)(?=[A-Z])', '_', enum.__name__).lower()
+
+
+class ControlledTermIndex:
+    """
+    Index of the controlled terms of all controlled term fields.
+
+    Attributes
+    ----------
+    enums: dict[tuple[str, str], type[Enum]]
+        Dictionary of (table name, field name) : controlled term Enum.
+    """
+
+    def __init__(self, enums: Dict[FieldKey, Type[Enum]]):
+        self.enums = enums
+        self._allowed_values: Dict[FieldKey, FrozenSet] = {
+            key: frozenset(member.value for member in enum) for key, enum in enums.items()}
+        self._members: Dict[FieldKey, Dict[object, Enum]] = {
+            key: {member.value: member for member in enum} for key, enum in enums.items()}
+
+    def __contains__(self, key: FieldKey) -> bool:
+        return key in self.enums
+
+    def __iter__(self) -> Iterator[FieldKey]:
+        return iter(self.enums)
+
+    def enum(self, table: str, field: str) -> Type[Enum]:
+        """Return the controlled term Enum of a field."""
+        return self.enums[(table, field)]
+
+    def allowed_values(self, table: str, field: str) -> FrozenSet:
+        """Return the allowed target values of a field."""
+        return self._allowed_values[(table, field)]
+
+    def member(self, table: str, field: str, value) -> Enum:
+        """Return the Enum member of a field for a target value."""
+        return self._members[(table, field)][value]
+
+    def is_allowed(self, table: str, field: str, value) -> bool:
+        """Return True if a value is an allowed target value of a field."""
+        return value in self._allowed_values[(table, field)]
+
+    def validate(self, table: str, field: str, values: 'pd.Series',
+                 allow_null: bool = True, allow_unmapped: bool = True) -> 'pd.Series':
+        """
+        Check a column of target values against the controlled terms of a field.
+
+        Parameters
+        ----------
+        table: str
+            Name of the target table.
+        field: str
+            Name of the target field.
+        values: pd.Series
+            Target values to check.
+        allow_null: bool
+            Consider null values valid.
+        allow_unmapped: bool
+            Consider the placeholder value for unmapped values valid.
+
+        Returns
+        -------
+        Boolean Series, True for valid values.
+        """
+        allowed = set(self._allowed_values[(table, field)])
+        if allow_unmapped:
+            allowed.add(UNMAPPED_VALUE)
+        valid = values.isin(allowed)
+        if allow_null:
+            valid |= values.isna()
+        return valid
+
+
+@lru_cache(maxsize=None)
+def controlled_term_index() -> ControlledTermIndex:
+    """
+    Return the index of all controlled term fields (built once).
+
+    Controlled term Enums are found in the subpackages of
+    `pancaim_cdm.semantic_mapping.controlled_terms`, which are named after
+    the target tables; the Enum class names are the CamelCase target
+    field names.
+    """
+    from pancaim_cdm.semantic_mapping import controlled_terms as package
+    enums = {}
+    for module_info in pkgutil.iter_modules(package.__path__):
+        if not module_info.ispkg or module_info.name.startswith(('_', '.', '~')):
+            continue
+        table = module_info.name
+        module = importlib.import_module(f'{package.__name__}.{table}')
+        for enum in module.__dict__.values():
+            if inspect.isclass(enum) and issubclass(enum, Enum):
+                enums[(table, _field_name(enum))] = enum
+    return ControlledTermIndex(enums)
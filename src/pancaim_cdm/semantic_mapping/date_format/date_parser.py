@@ -0,0 +1,112 @@
+import re
+from datetime import datetime
+from enum import Enum
+from typing import Dict, Iterable, List, Optional, Pattern, Tuple
+
+try:
+    from _strptime import TimeRE
+except ImportError:
+    # private module of CPython; without it, every format is tried with strptime
+    TimeRE = None
+
+
+class DateParser:
+    """
+    Compiled parser for a set of source date formats.
+
+    Each input format is compiled once to the regular expression
+    `datetime.strptime` uses internally, so values that do not match a
+    format are rejected without raising (and catching) an exception
+    (on Python implementations without that regular expression, every
+    format is tried with `datetime.strptime`).
+    Parse results are memoized per distinct source string.
+
+    Attributes
+    ----------
+    date_formats: dict[str, Enum]
+        Dictionary of source date format : target date format mappings.
+        Formats are tried in the order of the dictionary.
+    cache_size: int
+        Maximum number of memoized source strings. The memo is cleared
+        when it grows beyond this size.
+    """
+
+    def __init__(self, date_formats: Dict[str, Enum], cache_size: int = 100_000):
+        self.date_formats = date_formats
+        self.cache_size = cache_size
+        self._formats = self._compile_formats(date_formats)
+        # source string : (formatted date, matching input format)
+        self._cache: Dict[str, Tuple[Optional[str], Optional[str]]] = {}
+
+    @staticmethod
+    def _compile_formats(date_formats: Dict[str, Enum]) \
+            -> List[Tuple[Optional[Pattern], str, str]]:
+        time_re = TimeRE() if TimeRE is not None else None
+        formats = []
+        for input_format, output_format in date_formats.items():
+            try:
+                pattern = time_re.compile(input_format) if time_re is not None else None
+            except (KeyError, ValueError, re.error):
+                # unsupported by the regex pre-check, always try strptime
+                pattern = None
+            formats.append((pattern, input_format, str(output_format.value)))
+        return formats
+
+    def _parse(self, date: str) -> Tuple[Optional[str], Optional[str]]:
+        for pattern, input_format, output_format in self._formats:
+            if pattern is not None and pattern.fullmatch(date) is None:
+                continue
+            try:
+                valid_date = datetime.strptime(date, input_format)
+            except ValueError:
+                # matched the pattern, but not a valid date (e.g. 2020-02-30)
+                continue
+            return valid_date.strftime(output_format), input_format
+        return None, None
+
+    def _parse_cached(self, date) -> Tuple[Optional[str], Optional[str]]:
+        date = str(date)
+        try:
+            return self._cache[date]
+        except KeyError:
+            pass
+        parsed = self._parse(date)
+        if len(self._cache) >= self.cache_size:
+            self._cache.clear()
+        self._cache[date] = parsed
+        return parsed
+
+    def parse(self, date) -> Optional[str]:
+        """
+        Parse a source date and return it in the target date format.
+
+        Parameters
+        ----------
+        date: str
+            Source date value (non-string values are converted to string).
+
+        Returns
+        -------
+        Formatted date for the first matching input format, or None if
+        no input format matches.
+        """
+        return self._parse_cached(date)[0]
+
+    def matched_format(self, date) -> Optional[str]:
+        """Return the first input format that matches a source date, or None."""
+        return self._parse_cached(date)[1]
+
+    def parse_many(self, dates: Iterable) -> Dict[object, Optional[str]]:
+        """
+        Parse distinct source dates.
+
+        Parameters
+        ----------
+        dates: iterable
+            Distinct source date values.
+
+        Returns
+        -------
+        Dictionary of source date : formatted date (or None).
+        """
+        return {date: self.parse(date) for date in dates}
@@ -0,0 +1,175 @@
+import re
+from collections import defaultdict
+from enum import Enum
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+_NON_ALPHANUMERIC = re.compile(r'[\W_]+')
+
+# words negating (part of) a source value, e.g. 'no whipple', 'niet gedaan';
+# a value with a negation only matches candidates with the same negation
+NEGATIONS = frozenset({
+    'no', 'not', 'non', 'none', 'never', 'without',  # English
+    'geen', 'niet', 'nooit', 'zonder',  # Dutch
+    'kein', 'keine', 'nicht', 'ohne',  # German
+    'sin', 'nunca',  # Spanish
+    'senza', 'nessun', 'nessuno', 'mai',  # Italian
+    'sans', 'pas', 'aucun',  # French
+    'ej', 'ingen', 'inte', 'utan',  # Swedish
+})
+
+# weight of the part of a value outside the best matching run of words
+UNCOVERED_PENALTY = 0.5
+
+# minimal similarity difference between the best and the next best target
+AMBIGUITY_MARGIN = 0.1
+
+
+class _Sentinel(Enum):
+    # an Enum member, so the sentinel survives pickling (e.g. to a worker)
+    NO_MATCH = 'no match'
+
+
+# sentinel for values without a (unique) match
+_NO_MATCH = _Sentinel.NO_MATCH
+
+
+def normalize_value(value: str) -> str:
+    """
+    Normalize a source value for approximate matching.
+
+    Case folds the value, replaces punctuation by spaces and collapses
+    whitespace, e.g. ' Whipple-procedure ' -> 'whipple procedure'.
+    """
+    return ' '.join(_NON_ALPHANUMERIC.sub(' ', value.casefold()).split())
+
+
+def _trigrams(value: str) -> FrozenSet[str]:
+    # padded as in PostgreSQL pg_trgm, so prefixes weigh more than suffixes
+    # (e.g. 'males' is similar to 'male') and single letters have a trigram
+    value = f'  {value} '
+    return frozenset(value[index:index + 3] for index in range(len(value) - 2))
+
+
+def _similarity(grams: FrozenSet[str], other_grams: FrozenSet[str]) -> float:
+    # Dice coefficient of two trigram sets
+    if not grams or not other_grams:
+        return 0.0
+    return 2 * len(grams & other_grams) / (len(grams) + len(other_grams))
+
+
+class FuzzyMatcher:
+    """
+    Approximate matching of source values to a fixed set of candidates.
+
+    Values are normalized (see `normalize_value`) and matched exactly
+    first; otherwise the candidate with the most similar trigrams wins,
+    either compared to the whole value or to a run of its words with the
+    same number of words as the candidate (so 'whipple procedure'
+    matches 'Whipple'). The similarity to a run of words is reduced in
+    proportion to the length of the other words of the value, so a
+    candidate has to cover most of the value. Values with a negation
+    (see `NEGATIONS`, e.g. 'not male', 'whipple not performed') only
+    match candidates with the same negation. Candidates are indexed by
+    trigram, so only candidates sharing a trigram with the value are
+    scored. Matches are memoized per distinct source value.
+
+    Attributes
+    ----------
+    candidates: dict[str, Any]
+        Dictionary of candidate source value : target value.
+    min_similarity: float
+        Minimal trigram similarity (0-1) of a fuzzy match. Values with
+        (nearly, see `AMBIGUITY_MARGIN`) equally similar candidates of
+        different targets are not matched, e.g. 'distal resection' with
+        candidates 'Distal' and 'Total resection'.
+    cache_size: int
+        Maximum number of memoized source values. The memo is cleared
+        when it grows beyond this size.
+    """
+
+    def __init__(self, candidates: Dict[str, Any], min_similarity: float = 0.7,
+                 cache_size: int = 100_000):
+        self.candidates = candidates
+        self.min_similarity = min_similarity
+        self.cache_size = cache_size
+        self._exact: Dict[str, Any] = {}
+        for candidate, target in candidates.items():
+            normalized = normalize_value(candidate)
+            if normalized and self._exact.get(normalized, target) != target:
+                # normalizes equal to a candidate with another target
+                target = _NO_MATCH
+            if normalized:
+                self._exact[normalized] = target
+        # (number of words, negations, trigrams, target) per normalized candidate
+        self._entries: List[Tuple[int, FrozenSet[str], FrozenSet[str], Any]] = [
+            (len(normalized.split()), NEGATIONS.intersection(normalized.split()),
+             _trigrams(normalized), target)
+            for normalized, target in self._exact.items() if target is not _NO_MATCH]
+        self._index: Dict[str, List[int]] = defaultdict(list)
+        for position, (_, _, grams, _) in enumerate(self._entries):
+            for gram in grams:
+                self._index[gram].append(position)
+        self._cache: Dict[str, Any] = {}
+
+    @staticmethod
+    def _window(words: List[str], start: int, word_count: int) -> Tuple[FrozenSet[str], float]:
+        # trigrams of a run of words, and the weight of a match with it
+        window = words[start:start + word_count]
+        uncovered = sum(map(len, words)) - sum(map(len, window))
+        return _trigrams(' '.join(window)), 1 - UNCOVERED_PENALTY * uncovered / sum(map(len, words))
+
+    def _match(self, value: str) -> Any:
+        normalized = normalize_value(value)
+        if not normalized:
+            return _NO_MATCH
+        if normalized in self._exact:
+            return self._exact[normalized]
+        words = normalized.split()
+        negations = NEGATIONS.intersection(words)
+        grams = _trigrams(normalized)
+        # word trigrams as well, to find candidates matching part of the value
+        lookup_grams = grams.union(*(_trigrams(word) for word in words))
+        positions = {position for gram in lookup_grams for position in self._index.get(gram, ())}
+        # (trigrams, weight) of runs of words, by number of words
+        windows: Dict[int, List[Tuple[FrozenSet[str], float]]] = {}
+        # best score per target
+        scores: Dict[Any, float] = {}
+        for position in positions:
+            word_count, candidate_negations, candidate_grams, target = self._entries[position]
+            if negations != candidate_negations:
+                # e.g. 'no whipple' is not 'Whipple'
+                continue
+            score = _similarity(grams, candidate_grams)
+            if word_count < len(words):
+                if word_count not in windows:
+                    windows[word_count] = [self._window(words, start, word_count)
+                                           for start in range(len(words) - word_count + 1)]
+                score = max(score, *(_similarity(window, candidate_grams) * weight
+                                     for window, weight in windows[word_count]))
+            scores[target] = max(score, scores.get(target, 0.0))
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        if not ranked or ranked[0][1] < self.min_similarity:
+            return _NO_MATCH
+        if len(ranked) > 1 and ranked[0][1] - ranked[1][1] < AMBIGUITY_MARGIN:
+            return _NO_MATCH
+        return ranked[0][0]
+
+    def get(self, value: str, default: Optional[Any] = None) -> Any:
+        """
+        Return the target value of the best matching candidate.
+
+        Parameters
+        ----------
+        value: str
+            Cleaned source value.
+        default:
+            Returned if no candidate matches.
+        """
+        try:
+            target = self._cache[value]
+        except KeyError:
+            target = self._match(value)
+            if len(self._cache) >= self.cache_size:
+                self._cache.clear()
+            self._cache[value] = target
+        return default if target is _NO_MATCH else target
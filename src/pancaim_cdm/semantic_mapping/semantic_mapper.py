@@ -1,12 +1,34 @@
-from datetime import datetime
+import time
 from enum import Enum
-from typing import Dict, Optional, Union
-
-import pandas as pd
-from sqlalchemy import Column
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, Tuple, Union
 
+from pancaim_cdm.semantic_mapping.controlled_terms.registry import controlled_term_index
+from pancaim_cdm.semantic_mapping.date_format.date_parser import DateParser
+from pancaim_cdm.semantic_mapping.fuzzy_matcher import FuzzyMatcher
+from pancaim_cdm.semantic_mapping.statistics import MapperStatistics, SpaceSaving, \
+    StatisticsRegistry, default_registry
+from pancaim_cdm.semantic_mapping.type_coercion import TypeCoercer, type_coercer
 from pancaim_cdm.semantic_mapping.unmapped_value import UNMAPPED_VALUE
 
+if TYPE_CHECKING:
+    # numpy and pandas are only imported when mapping columns, to keep
+    # importing this module (and single value lookups) fast
+    import numpy as np
+    import pandas as pd
+    from sqlalchemy import Column
+
+# sentinel for source values without a semantic mapping
+_NOT_MAPPED = object()
+
+
+class FieldKind(Enum):
+    # Mapping behaviour, determined once per target field
+    DATE = 'date'
+    CONTROLLED_TERM = 'controlled term'
+    NULLABLE_CONTROLLED_TERM = 'nullable controlled term'
+    OTHER = 'other'
+
 
 class SemanticMapper:
     """
@@ -14,7 +36,7 @@ class SemanticMapper:
 
     Attributes
     ----------
-    field: Column
+    field: 'Column'
         PANCAIM CDM column definition (e.g. Person.sex). This
         parameter is needed to check if the column is nullable.
     semantic_mappings: dict[str, Enum]
@@ -22,49 +44,375 @@ class SemanticMapper:
     date_formats: dict[str, Enum]
         Dictionary of source date format : target date format mappings
         (only applicable to date fields).
+    cache_size: int, optional
+        If set, memoize up to this many lookup results keyed on the raw
+        source value (least recently used results are evicted first).
+        Useful for low-cardinality fields, e.g. sex or vital status.
+    fuzzy_matching: bool
+        If True, source values without a semantic mapping are matched
+        approximately (ignoring case, whitespace and punctuation, and
+        tolerating spelling variants) to the semantic mapping keys and
+        the controlled terms of the field. Only applicable to controlled
+        term fields.
+    min_similarity: float
+        Minimal similarity (0-1) of an approximate match.
+    coerce_types: bool
+        If True, source values of Integer, Numeric and Boolean fields
+        without a semantic mapping are converted to the field type (see
+        `TypeCoercer`); values that cannot be converted are mapped to
+        None (and kept as raw value). No effect on other fields.
+    factorize: bool
+        If True, `map_series` maps each distinct source value of a column
+        once, and broadcasts the results to the rows. Mapping time then
+        scales with the number of distinct values rather than rows, e.g.
+        for controlled terms and dates. String and categorical columns
+        are always mapped this way; the option applies to other columns
+        (e.g. numbers read with type inference).
     """
 
     def __init__(self,
-                 field: Column,
+                 field: 'Column',
                  semantic_mappings: Optional[Dict[Optional[str],
                                                   Union[Enum, int, str, None]]] = None,
-                 date_formats: Optional[Dict[str, Enum]] = None):
+                 date_formats: Optional[Dict[str, Enum]] = None,
+                 cache_size: Optional[int] = None,
+                 fuzzy_matching: bool = False,
+                 min_similarity: float = 0.7,
+                 coerce_types: bool = False,
+                 factorize: bool = False):
+        self.table_name = field.table.name
         self.field_name = field.name
+        self.raw_field_name = self._raw_field_name(field)
         self.nullable = field.nullable
         self.placeholder_value = UNMAPPED_VALUE if self._map_to_placeholder(field) else None
         self.semantic_mappings = semantic_mappings
         self.date_formats = date_formats
+        self.date_parser = DateParser(date_formats) if date_formats else None
+        self.field_kind = self._field_kind()
+        # target values unwrapped from their Enum, so a lookup is a single dict probe
+        self.target_mappings = {key: value.value if isinstance(value, Enum) else value
+                                for key, value in (semantic_mappings or {}).items()}
+        self.fuzzy_matcher = self._fuzzy_matcher(min_similarity) if fuzzy_matching else None
+        self.type_coercer: Optional[TypeCoercer] = \
+            type_coercer(field) if coerce_types and self.field_kind is FieldKind.OTHER else None
+        self.cache_size = cache_size
+        self.factorize = factorize
+        self.statistics: Optional[MapperStatistics] = None
+        self._build_lookup()
+
+    def __getstate__(self) -> dict:
+        # compiled lookup functions are closures, which cannot be
+        # pickled; they are rebuilt when unpickling (e.g. in a worker)
+        state = self.__dict__.copy()
+        del state['_lookup']
+        del state['_cached_lookup']
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._build_lookup()
+
+    def _build_lookup(self) -> None:
+        self._lookup = self._compile_lookup()
+        self._cached_lookup = None
+        if self.cache_size is not None:
+            self._lookup = self._cache_lookup(self._lookup, self.cache_size)
+        if self.statistics is not None:
+            self._lookup = self._instrument_lookup(self._lookup)
 
     @staticmethod
     def _clean_value(value) -> Optional[str]:
         # return null values (nan, None, '') as None
         # return non-null values as string (stripped of spaces)
-        if pd.isnull(value):
+        if type(value) is str:
+            # fast path for the most common source type
+            value = value.strip()
+            return value if value != '' else None
+        if value is None or (isinstance(value, float) and value != value):
             return None
+        if not isinstance(value, (int, float)):
+            # other null values (e.g. NaT, pd.NA)
+            from pandas import isnull
+            if isnull(value):
+                return None
         value = str(value).strip()
         return value if value != '' else None
 
     @staticmethod
-    def _format_datetime(date: str, input_format: str, output_format: str) \
-            -> Optional[str]:
-        # Parse input datetime and return using specified output format.
-        # Input and output format should use supported datetime syntax,
-        # see: https://strftime.org/
-        try:
-            date = str(date)
-            valid_date = datetime.strptime(date, input_format)
-            return valid_date.strftime(output_format)
-        except ValueError:
-            return None
+    def _clean_values(values: 'pd.Series') -> Tuple['np.ndarray', 'np.ndarray']:
+        # vectorized equivalent of _clean_value, returns an object array
+        # with None for null values, and a boolean array of non-null values
+        import numpy as np
+        import pandas as pd
+        present = values.notna().to_numpy()
+        cleaned = np.full(len(values), None, dtype=object)
+        if not present.any():
+            return cleaned, present
+        values = values[present]
+        if pd.api.types.infer_dtype(values, skipna=True) == 'string':
+            # strip each distinct string only once; not applicable to
+            # other types, as e.g. 1 and 1.0 hash equally but differ as str
+            codes, uniques = pd.factorize(values)
+            stripped = pd.Index(uniques, dtype=object).str.strip().to_numpy(dtype=object)
+            stripped[stripped == ''] = None
+            stripped = stripped[codes]
+        else:
+            # cast to Python objects first, so str() is applied to the
+            # same values as in _clean_value (e.g. Timestamp, float)
+            stripped = values.astype(object).astype(str).str.strip().to_numpy(dtype=object)
+            stripped[stripped == ''] = None
+        cleaned[present] = stripped
+        return cleaned, ~np.equal(cleaned, None)
 
     @staticmethod
-    def _map_to_placeholder(field: Column) -> bool:
+    def _take(values: 'np.ndarray', lookup_table: Dict[Any, Any]) \
+            -> Tuple['np.ndarray', 'np.ndarray']:
+        # Look up each value in lookup_table, without letting pandas
+        # infer a dtype for the target values. Returns a boolean array
+        # of matches and an object array of targets (None if unmatched).
+        import numpy as np
+        import pandas as pd
+        keys = [key for key in lookup_table if key is not None]
+        targets = np.empty(len(keys) + 1, dtype=object)
+        targets[:len(keys)] = [lookup_table[key] for key in keys]
+        targets[-1] = None
+        positions = pd.Index(keys, dtype=object).get_indexer(values)
+        return positions >= 0, targets[positions]
+
+    def _format_date(self, date) -> Optional[str]:
+        # Parse input date with the first matching input format and
+        # return it using the corresponding output format
+        if self.date_parser is None:
+            return None
+        return self.date_parser.parse(date)
+
+    @classmethod
+    def _map_to_placeholder(cls, field: 'Column') -> bool:
         if str(field.type) == 'TEXT':
-            raw_col_name = field.name + '_raw_value'
-            if raw_col_name in field.table.columns:
+            if cls._raw_field_name(field) is not None:
                 return True
         return False
 
+    @staticmethod
+    def _raw_field_name(field: 'Column') -> Optional[str]:
+        raw_col_name = field.name + '_raw_value'
+        return raw_col_name if raw_col_name in field.table.columns else None
+
+    def _field_kind(self) -> FieldKind:
+        if self.field_name.endswith('date'):
+            return FieldKind.DATE
+        if self.placeholder_value and not self.nullable:
+            return FieldKind.CONTROLLED_TERM
+        if self.placeholder_value and self.nullable:
+            return FieldKind.NULLABLE_CONTROLLED_TERM
+        return FieldKind.OTHER
+
+    def _fuzzy_matcher(self, min_similarity: float) -> FuzzyMatcher:
+        if self.field_kind not in (FieldKind.CONTROLLED_TERM, FieldKind.NULLABLE_CONTROLLED_TERM):
+            raise ValueError(f'Fuzzy matching is only applicable to controlled term fields, '
+                             f'not to: {self.table_name}.{self.field_name}')
+        candidates = {}
+        index = controlled_term_index()
+        if (self.table_name, self.field_name) in index:
+            for value in index.allowed_values(self.table_name, self.field_name):
+                candidates[value] = value
+        # semantic mappings take precedence over the controlled terms
+        candidates.update((key, value) for key, value in self.target_mappings.items()
+                          if isinstance(key, str))
+        return FuzzyMatcher(candidates, min_similarity)
+
+    def _compile_lookup(self) -> Callable[[Any], Union[None, str, int]]:
+        # Build a lookup function specialized for the field kind, with
+        # all per-field settings bound as closure variables.
+        clean_value = self._clean_value
+        mappings = self.target_mappings
+        placeholder_value = self.placeholder_value
+        get_mapping = mappings.get
+        fuzzy_matcher = self.fuzzy_matcher
+
+        if fuzzy_matcher is not None:
+            def get_mapping(source_value, default=None):
+                # fall back to an approximate match for unmapped values
+                mapped_value = mappings.get(source_value, _NOT_MAPPED)
+                if mapped_value is _NOT_MAPPED:
+                    if source_value is None:
+                        return default
+                    return fuzzy_matcher.get(source_value, default)
+                return mapped_value
+
+        if self.field_kind is FieldKind.DATE:
+            format_date = self._format_date
+
+            def lookup_date(source_value):
+                source_value = clean_value(source_value)
+                # a mapped value replaces the source value before formatting
+                date_value = mappings.get(source_value, source_value)
+                if date_value is None:
+                    return None
+                formatted_date = format_date(date_value)
+                return placeholder_value if formatted_date is None else formatted_date
+            return lookup_date
+
+        if self.field_kind is FieldKind.CONTROLLED_TERM:
+            def lookup_controlled_term(source_value):
+                mapped_value = get_mapping(clean_value(source_value))
+                return placeholder_value if mapped_value is None else mapped_value
+            return lookup_controlled_term
+
+        if self.field_kind is FieldKind.NULLABLE_CONTROLLED_TERM:
+            def lookup_nullable_controlled_term(source_value):
+                source_value = clean_value(source_value)
+                mapped_value = get_mapping(source_value, _NOT_MAPPED)
+                if mapped_value is _NOT_MAPPED:
+                    return None if source_value is None else placeholder_value
+                return mapped_value
+            return lookup_nullable_controlled_term
+
+        if self.type_coercer is not None:
+            coerce_value = self.type_coercer.coerce_value
+
+            def lookup_other_coerced(source_value):
+                source_value = clean_value(source_value)
+                mapped_value = mappings.get(source_value, _NOT_MAPPED)
+                if mapped_value is _NOT_MAPPED:
+                    return None if source_value is None else coerce_value(source_value)
+                return mapped_value
+            return lookup_other_coerced
+
+        def lookup_other(source_value):
+            return mappings.get(clean_value(source_value))
+        return lookup_other
+
+    def _cache_lookup(self, lookup: Callable, cache_size: int) -> Callable:
+        # typed, so that e.g. 1 and 1.0 (equal keys, different str) are cached separately
+        cached_lookup = lru_cache(maxsize=cache_size, typed=True)(lookup)
+        self._cached_lookup = cached_lookup
+
+        def lookup_cached(source_value):
+            try:
+                hash(source_value)
+            except TypeError:
+                # unhashable source values bypass the cache
+                return lookup(source_value)
+            return cached_lookup(source_value)
+        return lookup_cached
+
+    def cache_info(self):
+        """
+        Return lookup cache statistics.
+
+        Returns
+        -------
+        Named tuple with hits, misses, maxsize and currsize (see
+        `functools.lru_cache`), or None if caching is disabled.
+        """
+        return self._cached_lookup.cache_info() if self._cached_lookup else None
+
+    def cache_clear(self) -> None:
+        """Clear the lookup cache and its statistics."""
+        if self._cached_lookup:
+            self._cached_lookup.cache_clear()
+
+    def _instrument_lookup(self, lookup: Callable) -> Callable:
+        # wrap the lookup function to update self.statistics; only
+        # installed when statistics are enabled
+        statistics = self.statistics
+        clean_value = self._clean_value
+        mappings = self.target_mappings
+        placeholder_value = self.placeholder_value
+        date_parser = self.date_parser if self.field_kind is FieldKind.DATE else None
+        perf_counter = time.perf_counter
+
+        def lookup_instrumented(source_value):
+            start = perf_counter()
+            mapped_value = lookup(source_value)
+            statistics.seconds += perf_counter() - start
+            statistics.calls += 1
+            if mapped_value is None or mapped_value == placeholder_value:
+                cleaned_value = clean_value(source_value)
+                if cleaned_value is None:
+                    statistics.null += 1
+                else:
+                    statistics.unmapped += 1
+                    if statistics.unmapped_values is not None:
+                        statistics.unmapped_values.add(cleaned_value)
+            else:
+                statistics.mapped += 1
+                if date_parser is not None:
+                    source_value = clean_value(source_value)
+                    date_format = date_parser.matched_format(mappings.get(source_value, source_value))
+                    if date_format is not None:
+                        statistics.date_formats[date_format] += 1
+            return mapped_value
+        return lookup_instrumented
+
+    def enable_statistics(self, registry: Optional[StatisticsRegistry] = None,
+                          unmapped_values: int = 0) -> MapperStatistics:
+        """
+        Start collecting mapping statistics.
+
+        Without statistics enabled, lookups are not instrumented at all.
+
+        Parameters
+        ----------
+        registry: StatisticsRegistry, optional
+            Registry to add the statistics of this mapper to (default:
+            `pancaim_cdm.semantic_mapping.statistics.default_registry`).
+        unmapped_values: int
+            If positive, also profile the most frequent source values
+            that are not mapped, with bounded memory (a sketch tracking
+            ten times this number of values).
+
+        Returns
+        -------
+        Statistics of this mapper, updated on every lookup and map_series call.
+        """
+        if self.statistics is None:
+            self.statistics = MapperStatistics(self.table_name, self.field_name)
+            (registry or default_registry).register(self)
+            self._build_lookup()
+        if unmapped_values > 0 and self.statistics.unmapped_values is None:
+            self.statistics.unmapped_values = SpaceSaving(10 * unmapped_values)
+        return self.statistics
+
+    def merge_statistics(self, statistics: MapperStatistics) -> None:
+        """
+        Add statistics collected by a copy of this mapper (e.g. in a worker process).
+
+        Parameters
+        ----------
+        statistics: MapperStatistics
+            Statistics of the copy, since its previous merge (see
+            `MapperStatistics.reset`).
+        """
+        if self.statistics is None:
+            raise ValueError(f'Statistics are not enabled for {self.table_name}.{self.field_name}')
+        self.statistics.merge(statistics)
+
+    def _record_statistics(self, cleaned: 'np.ndarray', present: 'np.ndarray', result: 'np.ndarray',
+                           date_values: Optional['np.ndarray'], seconds: float) -> None:
+        # update self.statistics for a mapped column
+        import numpy as np
+        import pandas as pd
+        statistics = self.statistics
+        not_mapped = np.equal(result, None)
+        if self.placeholder_value is not None:
+            not_mapped |= result == self.placeholder_value
+        statistics.seconds += seconds
+        statistics.calls += len(result)
+        statistics.mapped += int((~not_mapped).sum())
+        statistics.unmapped += int((not_mapped & present).sum())
+        statistics.null += int((not_mapped & ~present).sum())
+        if statistics.unmapped_values is not None:
+            unmapped = pd.Series(cleaned[not_mapped & present], dtype=object)
+            statistics.unmapped_values.update(unmapped.value_counts(sort=False).items())
+        if date_values is not None and self.date_parser is not None:
+            date_values = pd.Series(date_values[~not_mapped], dtype=object)
+            for date_value, count in date_values.value_counts().items():
+                date_format = self.date_parser.matched_format(date_value)
+                if date_format is not None:
+                    statistics.date_formats[date_format] += count
+
     def lookup(self, source_value: Optional[str]) -> Union[None, str, int]:
         """
         Map source value to target value.
@@ -78,37 +426,122 @@ class SemanticMapper:
         -------
         Mapped value (typically string or integer), or None.
         """
-        source_value = self._clean_value(source_value)
-        # try to map the value (applies to all field types)
-        mapping_available = False
-        mapped_value = None
-        if source_value in self.semantic_mappings:
-            mapping_available = True
-            mapped_value = self.semantic_mappings.get(source_value)
-            mapped_value = mapped_value.value if isinstance(mapped_value, Enum) else mapped_value
+        return self._lookup(source_value)
+
+    def _map_values(self, cleaned: 'np.ndarray', present: 'np.ndarray') \
+            -> Tuple['np.ndarray', Optional['np.ndarray']]:
+        # vectorized equivalent of lookup for cleaned values, returns an
+        # object array of target values and, for date fields, the dates
+        # before formatting
+        import numpy as np
+        import pandas as pd
+        mappings = self.target_mappings
+        known, mapped = self._take(cleaned, mappings)
+        if None in mappings:
+            known[~present] = True
+            mapped[~present] = mappings[None]
+        if self.fuzzy_matcher is not None:
+            # approximate matches for (each distinct) unmapped value
+            unknown = np.flatnonzero(present & ~known)
+            matches = {}
+            for source_value in pd.unique(cleaned[unknown]):
+                mapped_value = self.fuzzy_matcher.get(source_value, _NOT_MAPPED)
+                if mapped_value is not _NOT_MAPPED:
+                    matches[source_value] = mapped_value
+            known[unknown], mapped[unknown] = self._take(cleaned[unknown], matches)
+        date_values = None
         # date field
-        if self.field_name.endswith('date'):
-            if mapping_available:
-                date_value = mapped_value
-            else:
-                date_value = source_value
-            if date_value is None:
-                return date_value
-            for input_format, output_format in self.date_formats.items():
-                output_format = str(output_format.value)
-                formatted_date = self._format_datetime(date_value, input_format, output_format)
-                if formatted_date is not None:
-                    return formatted_date
-            return self.placeholder_value
+        if self.field_kind is FieldKind.DATE:
+            date_values = np.where(known, mapped, cleaned)
+            to_format = ~np.equal(date_values, None)
+            formatted_dates = {}
+            for date_value in pd.unique(date_values[to_format]):
+                formatted_date = self._format_date(date_value)
+                formatted_dates[date_value] = formatted_date if formatted_date is not None \
+                    else self.placeholder_value
+            result = np.full(len(cleaned), None, dtype=object)
+            result[to_format] = self._take(date_values[to_format], formatted_dates)[1]
         # controlled term field (non-nullable)
-        if self.placeholder_value and not self.nullable:
-            if mapping_available and mapped_value is not None:
-                return mapped_value
-            return self.placeholder_value
+        elif self.field_kind is FieldKind.CONTROLLED_TERM:
+            result = np.where(known & ~np.equal(mapped, None), mapped, self.placeholder_value)
         # controlled term field (nullable)
-        if self.placeholder_value and self.nullable:
-            if mapping_available:
-                return mapped_value
-            return None if source_value is None else self.placeholder_value
+        elif self.field_kind is FieldKind.NULLABLE_CONTROLLED_TERM:
+            result = np.where(known, mapped, np.where(present, self.placeholder_value, None))
         # other fields (e.g. numeric)
-        return mapped_value
+        else:
+            result = mapped
+            if self.type_coercer is not None:
+                to_coerce = present & ~known
+                result[to_coerce] = self.type_coercer.coerce(cleaned[to_coerce])
+        return result, date_values
+
+    def _encode(self, values: 'pd.Series') -> Optional[Tuple['np.ndarray', 'pd.Series']]:
+        # codes and distinct values of a dictionary-encoded (categorical)
+        # column, or of a factorized column; None to map row by row
+        import pandas as pd
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # e.g. read by read_arrow_source_chunks
+            return values.cat.codes.to_numpy(), pd.Series(values.cat.categories, dtype=object)
+        if not self.factorize and values.dtype != object:
+            return None
+        codes, uniques = pd.factorize(values)
+        if values.dtype == object and pd.api.types.infer_dtype(uniques, skipna=True) != 'string':
+            # mixed objects, e.g. 1 and 1.0 hash equally but differ as str;
+            # only strings are factorized, so their distinct values are
+            # checked instead of every row
+            return None
+        return codes, pd.Series(uniques, dtype=object)
+
+    def map_series(self, source_values: 'pd.Series', raw_values: bool = False) \
+            -> Union['pd.Series', 'pd.DataFrame']:
+        """
+        Map a column of source values to target values.
+
+        Vectorized equivalent of ``source_values.apply(self.lookup)``.
+
+        Parameters
+        ----------
+        source_values: pd.Series
+            Values to map.
+        raw_values: bool
+            If True, also return the cleaned source values as the
+            companion raw value column of the field.
+
+        Returns
+        -------
+        Series of mapped values (object dtype, None for missing values)
+        named after the field, or a DataFrame with the mapped and raw
+        value columns if `raw_values` is True.
+        """
+        import numpy as np
+        import pandas as pd
+
+        start = time.perf_counter()
+        encoded = self._encode(source_values)
+        if encoded is not None:
+            # map each distinct value once, and broadcast through the codes
+            codes, distinct_values = encoded
+            cleaned, present = self._clean_values(distinct_values)
+            # code -1 (missing value) takes the appended missing value
+            cleaned, present = np.append(cleaned, None), np.append(present, False)
+            result, date_values = self._map_values(cleaned, present)
+            result = result[codes]
+            if raw_values or self.statistics is not None:
+                cleaned, present = cleaned[codes], present[codes]
+                if date_values is not None:
+                    date_values = date_values[codes]
+        else:
+            cleaned, present = self._clean_values(source_values)
+            result, date_values = self._map_values(cleaned, present)
+        if self.statistics is not None:
+            self._record_statistics(cleaned, present, result, date_values,
+                                    time.perf_counter() - start)
+        mapped_values = pd.Series(result, index=source_values.index,
+                                  dtype=object, name=self.field_name)
+        if not raw_values:
+            return mapped_values
+        raw_field_name = self.raw_field_name or self.field_name + '_raw_value'
+        return pd.DataFrame({
+            self.field_name: mapped_values,
+            raw_field_name: pd.Series(cleaned, index=source_values.index, dtype=object),
+        })
@@ -0,0 +1,256 @@
+import copy
+import heapq
+import json
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+
+class SpaceSaving:
+    """
+    Bounded memory counter of the most frequent values (Space-Saving sketch).
+
+    Tracks at most `capacity` values. When a new value arrives while the
+    sketch is full, it replaces the least frequent tracked value and
+    inherits its count; that count is recorded as the maximal
+    overestimation (error) of the new value. Values occurring more than
+    total / capacity times are always tracked.
+
+    Attributes
+    ----------
+    capacity: int
+        Maximum number of tracked values.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.counts: Dict[Hashable, int] = {}
+        self.errors: Dict[Hashable, int] = {}
+        # min-heap of (count, sequence, value) of the tracked values; the
+        # count of an entry may be lower than the tracked count, as
+        # entries are only updated when they reach the top of the heap
+        self._heap: List[Tuple[int, int, Hashable]] = []
+        self._sequence = 0
+
+    def _push(self, value: Hashable, count: int) -> None:
+        self._sequence += 1
+        heapq.heappush(self._heap, (count, self._sequence, value))
+
+    def _pop_minimum(self) -> Tuple[Hashable, int]:
+        # remove the least frequent tracked value; O(log capacity) amortized
+        heap, counts = self._heap, self.counts
+        while True:
+            count, _, value = heap[0]
+            if counts[value] == count:
+                heapq.heappop(heap)
+                return value, count
+            self._sequence += 1
+            heapq.heapreplace(heap, (counts[value], self._sequence, value))
+
+    def add(self, value: Hashable, count: int = 1) -> None:
+        """Count a value `count` times."""
+        counts = self.counts
+        if value in counts:
+            counts[value] += count
+        elif len(counts) < self.capacity:
+            counts[value] = count
+            self.errors[value] = 0
+            self._push(value, count)
+        else:
+            # the new value replaces the least frequent tracked value
+            evicted, minimum = self._pop_minimum()
+            del counts[evicted], self.errors[evicted]
+            counts[value] = minimum + count
+            self.errors[value] = minimum
+            self._push(value, minimum + count)
+
+    def update(self, value_counts: Iterable[Tuple[Hashable, int]]) -> None:
+        """Count (value, count) pairs, e.g. from `pd.Series.value_counts().items()`."""
+        for value, count in value_counts:
+            self.add(value, int(count))
+
+    def merge(self, other: 'SpaceSaving') -> None:
+        """Add the counts of another sketch (e.g. of a worker process)."""
+        self.update(other.counts.items())
+        for value, error in other.errors.items():
+            if value in self.errors:
+                self.errors[value] += error
+
+    def top(self, n: Optional[int] = None) -> List[Tuple[Hashable, int, int]]:
+        """Return (value, count, maximal overestimation) of the `n` most frequent values."""
+        values = sorted(self.counts, key=self.counts.__getitem__, reverse=True)[:n]
+        return [(value, self.counts[value], self.errors[value]) for value in values]
+
+
+@dataclass
+class MapperStatistics:
+    """
+    Counters collected by an instrumented SemanticMapper.
+
+    Attributes
+    ----------
+    table_name: str
+        Name of the target table.
+    field_name: str
+        Name of the target field.
+    calls: int
+        Number of mapped source values.
+    mapped: int
+        Number of values mapped to a target value.
+    unmapped: int
+        Number of non-null values without a target value (i.e. mapped
+        to the placeholder value or to None).
+    null: int
+        Number of null source values (None, nan, empty strings).
+    cache_hits: int
+        Number of lookups answered by the lookup cache.
+    seconds: float
+        Cumulative time spent mapping.
+    date_formats: Counter
+        Number of dates parsed with each source date format.
+    unmapped_values: SpaceSaving, optional
+        Most frequent (cleaned) source values that were not mapped, if
+        profiling is enabled.
+    """
+    table_name: str
+    field_name: str
+    calls: int = 0
+    mapped: int = 0
+    unmapped: int = 0
+    null: int = 0
+    cache_hits: int = 0
+    seconds: float = 0.0
+    date_formats: Counter = field(default_factory=Counter)
+    unmapped_values: Optional[SpaceSaving] = None
+
+    def merge(self, other: 'MapperStatistics') -> None:
+        """
+        Add the counters of other statistics of the same field (e.g. of a worker process).
+
+        Cache hits are not added, as they are read from the lookup cache
+        of the registered mapper.
+        """
+        for name in ('calls', 'mapped', 'unmapped', 'null', 'seconds'):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        self.date_formats.update(other.date_formats)
+        if self.unmapped_values is not None and other.unmapped_values is not None:
+            self.unmapped_values.merge(other.unmapped_values)
+
+    def reset(self) -> 'MapperStatistics':
+        """Reset all counters in place, and return a copy of their previous values."""
+        previous = copy.deepcopy(self)
+        self.calls = self.mapped = self.unmapped = self.null = self.cache_hits = 0
+        self.seconds = 0.0
+        self.date_formats.clear()
+        if self.unmapped_values is not None:
+            self.unmapped_values = SpaceSaving(self.unmapped_values.capacity)
+        return previous
+
+    def to_dict(self) -> Dict:
+        statistics = self.__dict__.copy()
+        statistics['date_formats'] = dict(self.date_formats)
+        if self.unmapped_values is not None:
+            statistics['unmapped_values'] = [[value, count] for value, count, _
+                                             in self.unmapped_values.top()]
+        return statistics
+
+
+class StatisticsRegistry:
+    """
+    Registry of the statistics of all instrumented SemanticMappers.
+
+    Statistics are collected per process; mappers unpickled in a worker
+    process count in their own copy, which `ParallelMapper` merges back
+    into the registered mappers with every mapped chunk.
+    """
+
+    def __init__(self):
+        self._mappers = []
+
+    def register(self, mapper) -> None:
+        """Register an instrumented SemanticMapper."""
+        self._mappers.append(mapper)
+
+    def clear(self) -> None:
+        """Forget all registered mappers."""
+        self._mappers.clear()
+
+    def collect(self) -> List[MapperStatistics]:
+        """Return the current statistics of all registered mappers."""
+        collected = []
+        for mapper in self._mappers:
+            cache_info = mapper.cache_info()
+            if cache_info is not None:
+                mapper.statistics.cache_hits = cache_info.hits
+            collected.append(mapper.statistics)
+        return collected
+
+    def to_json(self, **json_kwargs) -> str:
+        """Dump the statistics of all registered mappers as JSON."""
+        return json.dumps([statistics.to_dict() for statistics in self.collect()], **json_kwargs)
+
+    def report(self, top_n: int = 10) -> str:
+        """
+        Return a plain text data quality report of all registered mappers.
+
+        Lists per field the number of values, the null and unmapped rates,
+        the most frequent unmapped source values (if profiled) and the
+        source date formats.
+
+        Parameters
+        ----------
+        top_n: int
+            Number of unmapped source values listed per field.
+        """
+        lines = []
+        for statistics in self.collect():
+            calls = statistics.calls or 1
+            lines.append(f'{statistics.table_name}.{statistics.field_name}: '
+                         f'{statistics.calls} values, '
+                         f'{statistics.null / calls:.1%} null, '
+                         f'{statistics.unmapped / calls:.1%} unmapped')
+            if statistics.unmapped_values is not None and statistics.unmapped:
+                # counts of values that replaced others in the sketch are upper bounds
+                unmapped_values = ', '.join(
+                    f'{value!r} ({"<=" if error else ""}{count})'
+                    for value, count, error in statistics.unmapped_values.top(top_n))
+                lines.append(f'    unmapped values: {unmapped_values}')
+            if statistics.date_formats:
+                date_formats = ', '.join(f'{date_format} ({count})' for date_format, count
+                                         in statistics.date_formats.most_common())
+                lines.append(f'    date formats: {date_formats}')
+        return '\n'.join(lines) + '\n'
+
+    def to_prometheus(self, prefix: str = 'pancaim_cdm_mapper') -> str:
+        """Dump the statistics of all registered mappers in Prometheus text format."""
+        metrics = (
+            ('calls', 'counter', 'Number of mapped source values.'),
+            ('mapped', 'counter', 'Number of values mapped to a target value.'),
+            ('unmapped', 'counter', 'Number of non-null values without a target value.'),
+            ('null', 'counter', 'Number of null source values.'),
+            ('cache_hits', 'counter', 'Number of lookups answered by the lookup cache.'),
+            ('seconds', 'counter', 'Cumulative time spent mapping.'),
+        )
+        collected = self.collect()
+        lines = []
+        for name, metric_type, description in metrics:
+            metric = f'{prefix}_{name}_total'
+            lines.append(f'# HELP {metric} {description}')
+            lines.append(f'# TYPE {metric} {metric_type}')
+            for statistics in collected:
+                labels = f'table="{statistics.table_name}",field="{statistics.field_name}"'
+                lines.append(f'{metric}{{{labels}}} {getattr(statistics, name)}')
+        metric = f'{prefix}_date_format_total'
+        lines.append(f'# HELP {metric} Number of dates parsed with each source date format.')
+        lines.append(f'# TYPE {metric} counter')
+        for statistics in collected:
+            for date_format, count in statistics.date_formats.items():
+                date_format = date_format.replace('\\', '\\\\').replace('"', '\\"')
+                labels = (f'table="{statistics.table_name}",field="{statistics.field_name}",'
+                          f'format="{date_format}"')
+                lines.append(f'{metric}{{{labels}}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+# registry used when no registry is passed to SemanticMapper.enable_statistics
+default_registry = StatisticsRegistry()
@@ -0,0 +1,152 @@
+import math
+import re
+from typing import TYPE_CHECKING, List, Optional, Union
+
+if TYPE_CHECKING:
+    import numpy as np
+    from sqlalchemy import Column
+
+# source values of Boolean fields (case insensitive)
+TRUE_VALUES = frozenset({'yes', 'y', 'true', 't', '1', 'ja', 'j', 'si', 'sí', 'oui'})
+FALSE_VALUES = frozenset({'no', 'n', 'false', 'f', '0', 'nee', 'nein', 'non'})
+
+# an optional comparator (censored values, e.g. '<5'), a number with
+# decimal and/or thousands separators, an optional exponent, and an
+# optional unit: separated by spaces ('4,5 mmol/L', '4.5 x10^9/L'), or
+# attached without digits ('12kg'; not '0x1F')
+NUMBER_PATTERN = (r'(?P<comparator>[<>]=?|[≤≥])?\s*'
+                  r'(?P<number>[+-]?(?:\d+(?:[.,]\d+)*|[.,]\d+))'
+                  r'(?:[eE](?P<exponent>[+-]?\d+))?'
+                  r'(?:[^\d\s.,+-][^\d]*|\s+[^\d\s.,+-].*)?')
+_NUMBER = re.compile(NUMBER_PATTERN, re.ASCII)
+_SEPARATOR = re.compile(r'[.,]')
+
+Coerced = Union[int, float, bool, None]
+
+
+def _thousands(groups: List[str]) -> Optional[str]:
+    # digits of groups split by thousands separators, or None if they
+    # are not groups of three digits (e.g. '1,5,6')
+    if not groups[0] or len(groups[0]) > 3 or any(len(group) != 3 for group in groups[1:]):
+        return None
+    return ''.join(groups)
+
+
+def _normalize(number: str, exponent: Optional[str]) -> Optional[str]:
+    # Return a number in Python syntax, or None if it is ambiguous. A
+    # separator is a decimal separator if it is the only separator ('4,5',
+    # '1.000'), or the last one after thousands separators of the other
+    # kind ('1.000,5'); repeated separators of one kind are thousands
+    # separators ('1,000,000').
+    sign = number[0] if number[0] in '+-' else ''
+    groups = _SEPARATOR.split(number[len(sign):])
+    separators = _SEPARATOR.findall(number)
+    fraction = None
+    if len(separators) <= 1:
+        integer = groups[0]
+        fraction = groups[1] if separators else None
+    elif len(set(separators[:-1])) == 1 and separators[-1] != separators[0]:
+        integer = _thousands(groups[:-1])
+        fraction = groups[-1]
+    elif len(set(separators)) == 1:
+        integer = _thousands(groups)
+    else:
+        integer = None
+    if integer is None:
+        return None
+    return (sign + integer + (f'.{fraction}' if fraction is not None else '')
+            + (f'e{exponent}' if exponent is not None else ''))
+
+
+def _to_integer(number: str) -> Optional[int]:
+    # parse a normalized number; exactly if written without decimals
+    # or exponent, as float64 cannot represent all (e.g. 20 digit) integers
+    if '.' not in number and 'e' not in number:
+        return int(number)
+    number = float(number)
+    return int(number) if number.is_integer() else None
+
+
+class TypeCoercer:
+    """
+    Conversion of cleaned source values to the type of a target field.
+
+    Numbers may use a decimal comma, may have thousands separators, may
+    have an exponent ('1.5E+03') and may be followed by a unit ('4,5
+    mmol/L'). Ambiguous separators ('1,5,6') are not coerced, nor are
+    censored numbers ('<5'), as their bound is not their value. Booleans are
+    recognized from common yes/no values in several languages (see
+    TRUE_VALUES and FALSE_VALUES). Values that cannot be coerced are
+    coerced to None, and are kept in the raw value column only.
+
+    Attributes
+    ----------
+    field_type: str
+        'integer', 'numeric' or 'boolean'.
+    """
+
+    def __init__(self, field_type: str):
+        if field_type not in ('integer', 'numeric', 'boolean'):
+            raise ValueError(f'Unknown field type: {field_type}')
+        self.field_type = field_type
+
+    def coerce_value(self, value: str) -> Coerced:
+        """Coerce a cleaned (stripped, non-empty) source value, or return None."""
+        if self.field_type == 'boolean':
+            value = value.casefold()
+            if value in TRUE_VALUES:
+                return True
+            if value in FALSE_VALUES:
+                return False
+            return None
+        match = _NUMBER.fullmatch(value)
+        if match is None or match.group('comparator') is not None:
+            return None
+        number = _normalize(match.group('number'), match.group('exponent'))
+        if number is None:
+            return None
+        if self.field_type == 'numeric':
+            number = float(number)
+            # e.g. '1e400'
+            return number if math.isfinite(number) else None
+        return _to_integer(number)
+
+    def coerce(self, values: 'np.ndarray') -> 'np.ndarray':
+        """
+        Coerce an array of cleaned (stripped, non-null) source values.
+
+        Vectorized equivalent of ``[self.coerce_value(value) for value in values]``;
+        each distinct value is parsed once.
+
+        Returns
+        -------
+        Object array of coerced values (None for values that cannot be
+        coerced).
+        """
+        import numpy as np
+        import pandas as pd
+
+        codes, uniques = pd.factorize(values)
+        uniques = pd.Series(uniques, dtype=object).astype(str)
+        if self.field_type == 'boolean':
+            folded = uniques.str.casefold()
+            coerced = np.full(len(uniques), None, dtype=object)
+            coerced[folded.isin(TRUE_VALUES).to_numpy()] = True
+            coerced[folded.isin(FALSE_VALUES).to_numpy()] = False
+            return coerced[codes]
+        # numbers have too many forms to parse them reliably with pandas
+        coerced = np.array([self.coerce_value(value) for value in uniques], dtype=object)
+        return coerced[codes]
+
+
+def type_coercer(field: 'Column') -> Optional[TypeCoercer]:
+    """Return the TypeCoercer for the type of a field, or None if not applicable."""
+    from sqlalchemy import Boolean, Integer, Numeric
+
+    if isinstance(field.type, Boolean):
+        return TypeCoercer('boolean')
+    if isinstance(field.type, Integer):
+        return TypeCoercer('integer')
+    if isinstance(field.type, Numeric):
+        return TypeCoercer('numeric')
+    return None
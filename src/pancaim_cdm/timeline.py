@@ -0,0 +1,124 @@
+"""Materialized timeline of the events of each patient, across the CDM event tables."""
+
+from typing import Union
+
+from sqlalchemy import Column, Date, Index, Integer, MetaData, Table, Text, literal, select, union_all
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.schema import CreateIndex, CreateTable, DropTable
+from sqlalchemy.sql import Select
+
+from pancaim_cdm.pancaim_orm import CDM_SCHEMA, BodyMeasurement, Lab, Lab2, Prognosis, Surgery, Therapy, Tumor
+
+TIMELINE = 'patient_timeline'
+
+# event date of each event table
+EVENT_DATES = {
+    BodyMeasurement: BodyMeasurement.__table__.c.body_measurement_date,
+    Lab: Lab.__table__.c.lab_date,
+    Lab2: Lab2.__table__.c.lab2_date,
+    Prognosis: Prognosis.__table__.c.prognosis_date,
+    Surgery: Surgery.__table__.c.date_of_surgery,
+    Therapy: Therapy.__table__.c.date_start_adjuvant_chemotherapy,
+    Tumor: Tumor.__table__.c.tumor_date,
+}
+
+# Not part of the ORM metadata, so that create_all does not create it as
+# a table; use it to query the timeline, e.g.
+# select(timeline).where(timeline.c.pancaim_id == 1).order_by(timeline.c.event_date)
+_metadata = MetaData()
+timeline = Table(
+    TIMELINE, _metadata,
+    Column('pancaim_id', Integer, nullable=False),
+    Column('event_date', Date),
+    Column('event_table', Text, nullable=False),
+    Column('event_id', Integer, nullable=False),
+    schema=CDM_SCHEMA,
+)
+_timeline_indexes = (
+    # required to refresh a materialized view concurrently
+    Index(f'ux_{TIMELINE}_event', timeline.c.event_table, timeline.c.event_id, unique=True),
+    Index(f'ix_{TIMELINE}_pancaim_id_event_date', timeline.c.pancaim_id, timeline.c.event_date),
+)
+
+
+def timeline_query() -> Select:
+    """Return the union of the events (pancaim_id, date, table and primary key) of all event tables."""
+    selects = []
+    for model, event_date in EVENT_DATES.items():
+        table = model.__table__
+        primary_key = list(table.primary_key.columns)[0]
+        selects.append(select(table.c.pancaim_id.label('pancaim_id'),
+                              event_date.label('event_date'),
+                              literal(table.name, Text).label('event_table'),
+                              primary_key.label('event_id')))
+    return union_all(*selects)
+
+
+def _materialized_view(bind: Connection) -> bool:
+    return bind.dialect.name == 'postgresql'
+
+
+def create_timeline(bind: Union[Engine, Connection]) -> None:
+    """
+    Create the patient timeline, indexed on (pancaim_id, event_date).
+
+    On PostgreSQL, the timeline is a materialized view; on other
+    databases, a table. Either is filled when created, and updated by
+    `refresh_timeline`.
+
+    Parameters
+    ----------
+    bind: Engine or Connection
+        Database with the CDM tables. An Engine is used in a single
+        transaction; a Connection is used as is.
+    """
+    if isinstance(bind, Engine):
+        with bind.begin() as connection:
+            return create_timeline(connection)
+    if _materialized_view(bind):
+        query = timeline_query().compile(dialect=bind.dialect, compile_kwargs={'literal_binds': True})
+        preparer = bind.dialect.identifier_preparer
+        bind.exec_driver_sql(f'CREATE MATERIALIZED VIEW {preparer.format_table(timeline)} AS {query}')
+    else:
+        bind.execute(CreateTable(timeline))
+        bind.execute(timeline.insert().from_select([column.name for column in timeline.columns],
+                                                   timeline_query()))
+    for index in _timeline_indexes:
+        bind.execute(CreateIndex(index))
+
+
+def refresh_timeline(bind: Union[Engine, Connection], concurrently: bool = False) -> None:
+    """
+    Update the patient timeline after loading the CDM tables.
+
+    Parameters
+    ----------
+    bind: Engine or Connection
+        Database with the timeline.
+    concurrently: bool
+        Keep the timeline readable while it is refreshed (PostgreSQL
+        only; slower than a plain refresh).
+    """
+    if isinstance(bind, Engine):
+        with bind.begin() as connection:
+            return refresh_timeline(connection, concurrently)
+    if _materialized_view(bind):
+        preparer = bind.dialect.identifier_preparer
+        concurrently = 'CONCURRENTLY ' if concurrently else ''
+        bind.exec_driver_sql(f'REFRESH MATERIALIZED VIEW {concurrently}{preparer.format_table(timeline)}')
+    else:
+        bind.execute(timeline.delete())
+        bind.execute(timeline.insert().from_select([column.name for column in timeline.columns],
+                                                   timeline_query()))
+
+
+def drop_timeline(bind: Union[Engine, Connection]) -> None:
+    """Drop the patient timeline (e.g. before dropping the CDM tables)."""
+    if isinstance(bind, Engine):
+        with bind.begin() as connection:
+            return drop_timeline(connection)
+    if _materialized_view(bind):
+        preparer = bind.dialect.identifier_preparer
+        bind.exec_driver_sql(f'DROP MATERIALIZED VIEW IF EXISTS {preparer.format_table(timeline)}')
+    else:
+        bind.execute(DropTable(timeline, if_exists=True))
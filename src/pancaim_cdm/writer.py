@@ -0,0 +1,194 @@
+"""Pipelined mapping and loading of CDM tables over a connection pool."""
+
+import threading
+from queue import Full, Queue
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+from pancaim_cdm.loader import bulk_load
+from pancaim_cdm.pancaim_orm import Base
+from pancaim_cdm.pipeline import TableMapping
+
+# tells a load thread to stop
+_STOP = object()
+
+
+def create_loading_engine(url: str, pool_size: int = 4, **engine_kwargs) -> Engine:
+    """
+    Create an Engine with a connection pool tuned for bulk loading.
+
+    The pool holds `pool_size` connections (one per load thread, without
+    overflow), which are checked before use, so a long load survives
+    connections dropped by the server. psycopg2 connections batch
+    executemany inserts into multi-row statements.
+
+    Parameters
+    ----------
+    url: str
+        Database URL.
+    pool_size: int
+        Number of pooled connections.
+    engine_kwargs:
+        Additional arguments for `sqlalchemy.create_engine`.
+    """
+    # QueuePool also for dialects defaulting to another pool (e.g. SQLite files)
+    engine_kwargs.setdefault('poolclass', QueuePool)
+    engine_kwargs.setdefault('pool_size', pool_size)
+    engine_kwargs.setdefault('max_overflow', 0)
+    engine_kwargs.setdefault('pool_pre_ping', True)
+    if url.startswith(('postgresql://', 'postgresql+psycopg2://')):
+        engine_kwargs.setdefault('executemany_mode', 'values_plus_batch')
+    return create_engine(url, **engine_kwargs)
+
+
+def foreign_key_order(table_names: Iterable[str]) -> List[str]:
+    """Sort CDM table names so referenced tables come first (e.g. person before lab)."""
+    order = {table.name: position for position, table in enumerate(Base.metadata.sorted_tables)}
+    return sorted(table_names, key=lambda table_name: order[table_name])
+
+
+class PipelinedWriter:
+    """
+    Load mapped chunks in background threads, while the next chunk is mapped.
+
+    Mapped chunks are passed to the load threads through a bounded queue,
+    so mapping (CPU) overlaps with loading (database round trips), and
+    at most `queue_size` mapped chunks wait in memory. Each chunk is
+    loaded in its own transaction, on a connection of the engine pool.
+
+    Attributes
+    ----------
+    engine: Engine
+        Database to load into (see `create_loading_engine`).
+    load_threads: int
+        Number of threads loading chunks concurrently (at most the pool
+        size of the engine).
+    queue_size: int
+        Maximum number of mapped chunks waiting to be loaded.
+    chunk_size: int
+        Number of rows sent to the database at once.
+    """
+
+    def __init__(self, engine: Engine, load_threads: int = 1, queue_size: int = 2,
+                 chunk_size: int = 50_000):
+        self.engine = engine
+        self.load_threads = load_threads
+        self.queue_size = queue_size
+        self.chunk_size = chunk_size
+        self.row_counts: Dict[str, int] = {}
+        self._queue: Queue = Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._error: Optional[BaseException] = None
+        self._failed = threading.Event()
+        self._threads = [threading.Thread(target=self._load, name=f'pancaim-cdm-load-{number}',
+                                          daemon=True)
+                         for number in range(load_threads)]
+        for thread in self._threads:
+            thread.start()
+
+    def __enter__(self) -> 'PipelinedWriter':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def _load(self) -> None:
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _STOP:
+                    return
+                if self._failed.is_set():
+                    # drain the queue, so the producer does not block
+                    continue
+                model, chunk = item
+                row_count = bulk_load(self.engine, model, chunk, self.chunk_size)
+                with self._lock:
+                    table_name = model.__tablename__
+                    self.row_counts[table_name] = self.row_counts.get(table_name, 0) + row_count
+            except BaseException as error:
+                with self._lock:
+                    if self._error is None:
+                        self._error = error
+                self._failed.set()
+            finally:
+                self._queue.task_done()
+
+    def _raise_error(self) -> None:
+        if self._failed.is_set():
+            raise self._error
+
+    def _put(self, item) -> None:
+        # block until there is room, unless a load thread failed
+        while True:
+            self._raise_error()
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except Full:
+                continue
+
+    def write(self, model, chunk: pd.DataFrame) -> None:
+        """Queue a mapped chunk for loading into the table of a model."""
+        if len(chunk):
+            self._put((model, chunk))
+
+    def flush(self) -> None:
+        """Wait until all queued chunks are loaded (e.g. before loading dependent tables)."""
+        self._queue.join()
+        self._raise_error()
+
+    def close(self) -> None:
+        """Load the remaining chunks and stop the load threads."""
+        try:
+            self.flush()
+        finally:
+            for _ in self._threads:
+                self._queue.put(_STOP)
+            for thread in self._threads:
+                thread.join()
+
+
+def load_tables(engine: Engine, table_mappings: Dict[str, TableMapping],
+                sources: Dict[str, Iterable[pd.DataFrame]], load_threads: int = 1,
+                queue_size: int = 2, chunk_size: int = 50_000) -> Dict[str, int]:
+    """
+    Map and load CDM tables, in foreign key order, with mapping and loading overlapped.
+
+    All chunks of a table are loaded before loading the tables that
+    reference it (e.g. person before lab).
+
+    Parameters
+    ----------
+    engine: Engine
+        Database to load into (see `create_loading_engine`).
+    table_mappings: dict[str, TableMapping]
+        Dictionary of table name : mappers for the table.
+    sources: dict[str, iterable of pd.DataFrame]
+        Dictionary of table name : source chunks.
+    load_threads: int
+        Number of threads loading chunks concurrently.
+    queue_size: int
+        Maximum number of mapped chunks waiting to be loaded.
+    chunk_size: int
+        Number of rows sent to the database at once.
+
+    Returns
+    -------
+    Dictionary of table name : number of loaded rows.
+    """
+    with PipelinedWriter(engine, load_threads, queue_size, chunk_size) as writer:
+        for table_name in foreign_key_order(sources):
+            table_mapping = table_mappings[table_name]
+            for number, chunk in enumerate(sources[table_name]):
+                mapped_chunk = table_mapping.map_chunk(chunk)
+                if number == 0 and load_threads > 1:
+                    # a single load thread loads chunks in order; several
+                    # threads have to finish the referenced tables first
+                    writer.flush()
+                writer.write(table_mapping.model, mapped_chunk)
+    return writer.row_counts
@@ -0,0 +1,31 @@
+import pytest
+from sqlalchemy import create_engine, event
+
+from pancaim_cdm.pancaim_orm import Base
+
+
+def attach_cdm_schema(engine, path: str = ':memory:', foreign_keys: bool = False):
+    """Attach cdm_schema to every connection of a SQLite Engine (in memory, or a file)."""
+    cdm_schema_path = ':memory:' if path == ':memory:' else f'{path}.cdm_schema'
+
+    @event.listens_for(engine, 'connect')
+    def attach(dbapi_connection, connection_record):
+        dbapi_connection.execute(f"ATTACH DATABASE '{cdm_schema_path}' AS cdm_schema")
+        if foreign_keys:
+            dbapi_connection.execute('PRAGMA foreign_keys = ON')
+
+    return engine
+
+
+def sqlite_engine(path: str = ':memory:', **engine_kwargs):
+    """SQLite Engine with cdm_schema attached (in memory, or a file)."""
+    return attach_cdm_schema(create_engine(f'sqlite:///{path}', **engine_kwargs), path)
+
+
+@pytest.fixture
+def cdm_engine():
+    """In-memory SQLite database with the CDM tables."""
+    engine = sqlite_engine()
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
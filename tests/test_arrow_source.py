@@ -0,0 +1,56 @@
+import pandas as pd
+import pytest
+
+from pancaim_cdm.pancaim_orm import Person
+from pancaim_cdm.pipeline import TableMapping, read_source_chunks
+from pancaim_cdm.semantic_mapping import SemanticMapper
+from pancaim_cdm.semantic_mapping.controlled_terms.person import Sex, VitalStatus
+
+pytest.importorskip('pyarrow')
+from pancaim_cdm.arrow_source import read_arrow_source_chunks  # noqa: E402
+
+COLUMNS = ['patient_id', 'gender', 'status', 'ecog']
+ROWS = [(patient_id, gender, status, ecog)
+        for patient_id, (gender, status, ecog) in enumerate(
+            [('m', 'alive', '1'), ('f', '', '2.0'), ('NA', 'dead', ''),
+             ('', 'null', 'unknown'), ('x', 'alive', 'NA')] * 200, start=1)]
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / 'person.csv'
+    lines = [','.join(COLUMNS)] + [','.join(str(value) for value in row) for row in ROWS]
+    path.write_text('\n'.join(lines) + '\n', encoding='utf8')
+    return path
+
+
+def _table_mapping() -> TableMapping:
+    return TableMapping(Person,
+                        {'gender': SemanticMapper(Person.sex, {'m': Sex.M, 'f': Sex.F, 'NA': Sex.OTHER}),
+                         'status': SemanticMapper(Person.vital_status, {'alive': VitalStatus.ALIVE,
+                                                                        'dead': VitalStatus.DEAD,
+                                                                        'null': None}),
+                         'ecog': SemanticMapper(Person.ecog_scale, {'NA': 0}, coerce_types=True)},
+                        {'patient_id': 'pancaim_id'})
+
+
+def test_chunks_equal_read_source_chunks(source):
+    # a small block size, so the file is read in several blocks
+    chunks = list(read_arrow_source_chunks(source, COLUMNS, block_size=4096))
+    assert len(chunks) > 1
+    arrow_source = pd.concat(chunks)
+    pd.testing.assert_index_equal(arrow_source.index, pd.RangeIndex(len(ROWS)), exact=False)
+    assert [chunk.index.start for chunk in chunks] \
+        == [sum(map(len, chunks[:number])) for number in range(len(chunks))]
+    expected = pd.concat(read_source_chunks(source, chunk_size=300))
+    pd.testing.assert_frame_equal(arrow_source.astype(object).where(arrow_source.notna(), None),
+                                  expected.astype(object).where(expected.notna(), None))
+
+
+def test_mapped_chunks_equal_read_source_chunks(source):
+    table_mapping = _table_mapping()
+    mapped = pd.concat([table_mapping.map_chunk(chunk)
+                        for chunk in read_arrow_source_chunks(source, COLUMNS, block_size=4096)])
+    expected = pd.concat([table_mapping.map_chunk(chunk)
+                          for chunk in read_source_chunks(source, chunk_size=300)])
+    pd.testing.assert_frame_equal(mapped.astype(object), expected.astype(object))
@@ -0,0 +1,47 @@
+from enum import Enum
+
+import pandas as pd
+import pytest
+
+from pancaim_cdm.pancaim_orm import Base
+from pancaim_cdm.semantic_mapping.controlled_terms.person import Sex, VitalStatus
+from pancaim_cdm.semantic_mapping.controlled_terms.registry import _field_name, controlled_term_index
+from pancaim_cdm.semantic_mapping.unmapped_value import UNMAPPED_VALUE
+
+
+def test_fields_are_orm_columns():
+    index = controlled_term_index()
+    assert ('person', 'sex') in index and ('person', 'vital_status') in index
+    tables = {table.name: table for table in Base.metadata.sorted_tables}
+    for table, field in index:
+        assert field in tables[table].columns, f'{table}.{field}'
+
+
+def test_field_name():
+    AgeAtDiagnosisGroup = Enum('AgeAtDiagnosisGroup', {'ADULT': 'Adult'})
+    assert _field_name(Sex) == 'sex'
+    assert _field_name(VitalStatus) == 'vital_status'
+    assert _field_name(AgeAtDiagnosisGroup) == 'age_at_diagnosis_group'
+
+
+def test_member_and_is_allowed():
+    index = controlled_term_index()
+    assert index.enum('person', 'sex') is Sex
+    assert index.allowed_values('person', 'sex') == {'Female', 'Male', 'Other'}
+    assert index.member('person', 'vital_status', 'Dead') is VitalStatus.DEAD
+    with pytest.raises(KeyError):
+        index.member('person', 'sex', 'male')
+    assert index.is_allowed('person', 'sex', 'Male')
+    assert not index.is_allowed('person', 'sex', 'M')
+    assert not index.is_allowed('person', 'sex', UNMAPPED_VALUE)
+
+
+def test_validate():
+    index = controlled_term_index()
+    values = pd.Series(['Male', 'male', None, UNMAPPED_VALUE, 'Female'])
+    assert index.validate('person', 'sex', values).tolist() == [True, False, True, True, True]
+    assert index.validate('person', 'sex', values, allow_null=False).tolist() \
+        == [True, False, False, True, True]
+    assert index.validate('person', 'sex', values, allow_unmapped=False).tolist() \
+        == [True, False, True, False, True]
+    assert index.validate('person', 'sex', pd.Series([float('nan')]), allow_null=False).tolist() == [False]
@@ -0,0 +1,44 @@
+import pytest
+
+from pancaim_cdm.semantic_mapping.date_format import DateFormat, date_parser
+from pancaim_cdm.semantic_mapping.date_format.date_parser import DateParser
+
+DATE_FORMATS = {'%Y-%m-%d': DateFormat.YMD, '%d-%m-%Y': DateFormat.YMD, '%Y': DateFormat.Y}
+DATES = {
+    '2020-01-05': ('2020-01-05', '%Y-%m-%d'),
+    '05-01-2020': ('2020-01-05', '%d-%m-%Y'),
+    '2020-1-5': ('2020-01-05', '%Y-%m-%d'),
+    '2020': ('2020', '%Y'),
+    # matches the pattern, but is not a valid date
+    '2020-02-30': (None, None),
+    '2020-01-05x': (None, None),
+    'garbage': (None, None),
+    '': (None, None),
+}
+
+
+@pytest.fixture(params=[True, False], ids=['pattern', 'strptime'])
+def parser(request, monkeypatch):
+    if not request.param:
+        # e.g. Python implementations without _strptime
+        monkeypatch.setattr(date_parser, 'TimeRE', None)
+    return DateParser(DATE_FORMATS)
+
+
+def test_parse(parser):
+    assert all(pattern is not None for pattern, _, _ in parser._formats) \
+        == (date_parser.TimeRE is not None)
+    for date, (formatted_date, input_format) in DATES.items():
+        assert parser.parse(date) == formatted_date, date
+        assert parser.matched_format(date) == input_format, date
+    assert parser.parse(2020) == '2020'
+    assert parser.parse_many(['2020', 'garbage']) == {'2020': '2020', 'garbage': None}
+
+
+def test_memo_is_bounded():
+    parser = DateParser(DATE_FORMATS, cache_size=3)
+    for year in range(2000, 2010):
+        assert parser.parse(str(year)) == str(year)
+        assert len(parser._cache) <= 3
+    assert parser.matched_format('2009') == '%Y'
+    assert '2009' in parser._cache
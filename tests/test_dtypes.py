@@ -0,0 +1,53 @@
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from pancaim_cdm.dtypes import compact, to_date
+from pancaim_cdm.pancaim_orm import Lab, Person
+from pancaim_cdm.semantic_mapping.unmapped_value import UNMAPPED_VALUE
+
+
+def test_compact():
+    frame = compact(Person, pd.DataFrame({'pancaim_id': [1, 2], 'sex': ['Male', UNMAPPED_VALUE],
+                                          'age_at_diagnosis': [55.5, None], 'surgery': [True, None]}))
+    assert str(frame.dtypes['pancaim_id']) == 'Int32'
+    assert frame['sex'].cat.categories.tolist() == [UNMAPPED_VALUE, 'Female', 'Male', 'Other']
+    assert frame['age_at_diagnosis'].isna().tolist() == [False, True]
+    assert str(frame.dtypes['surgery']) == 'boolean'
+
+
+def test_compact_out_of_range_dates():
+    # the raw value column keeps the source value
+    frame = compact(Lab, pd.DataFrame({'lab_date': ['2020-01-05', '0202-01-05', None],
+                                       'lab_date_raw_value': ['05-01-2020', '05-01-0202', None]}))
+    assert frame['lab_date'].isna().tolist() == [False, True, True]
+    assert frame['lab_date_raw_value'].tolist()[:2] == ['05-01-2020', '05-01-0202']
+
+
+def test_compact_out_of_range_integers():
+    ecog_scale = [1, 3000000000, -2 ** 31, 2 ** 31 - 1, 10 ** 25, None]
+    frame = compact(Person, pd.DataFrame({'ecog_scale': pd.Series(ecog_scale, dtype=object),
+                                          'ecog_scale_raw_value': [str(value) for value in ecog_scale]}))
+    assert frame['ecog_scale'].tolist() == [1, pd.NA, -2 ** 31, 2 ** 31 - 1, pd.NA, pd.NA]
+    assert frame['ecog_scale_raw_value'].tolist()[1] == '3000000000'
+
+
+def test_compact_invalid_controlled_term():
+    with pytest.raises(ValueError, match='Not a controlled term of sex'):
+        compact(Person, pd.DataFrame({'sex': ['Man']}))
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('2020-01-05', date(2020, 1, 5)),
+    ('0202-01-05', date(202, 1, 5)),
+    ('2020-01', date(2020, 1, 1)),
+    ('2020', date(2020, 1, 1)),
+    ('2020-02-30', None),
+    ('garbage', None),
+    (None, None),
+    (pd.NaT, None),
+    (pd.Timestamp('2020-01-05 10:00'), date(2020, 1, 5)),
+])
+def test_to_date(value, expected):
+    assert to_date(value) == expected
@@ -0,0 +1,68 @@
+import pandas as pd
+import pytest
+
+from pancaim_cdm.executor import ParallelMapper
+from pancaim_cdm.pancaim_orm import Person
+from pancaim_cdm.pipeline import TableMapping
+from pancaim_cdm.semantic_mapping import SemanticMapper
+from pancaim_cdm.semantic_mapping.controlled_terms.person import Sex
+from pancaim_cdm.semantic_mapping.statistics import StatisticsRegistry
+
+SOURCE = pd.DataFrame({'patient_id': range(1, 1001),
+                       'gender': ['m', 'f', 'x', None, 'unknown'] * 200})
+
+
+def _person_mapping(**mapper_kwargs) -> TableMapping:
+    return TableMapping(Person,
+                        {'gender': SemanticMapper(Person.sex, {'m': Sex.M, 'f': Sex.F}, **mapper_kwargs)},
+                        {'patient_id': 'pancaim_id'})
+
+
+@pytest.mark.parametrize('mapper_kwargs', [{}, {'factorize': True}, {'cache_size': 16}])
+def test_worker_statistics_are_merged(mapper_kwargs):
+    registry = StatisticsRegistry()
+    table_mapping = _person_mapping(**mapper_kwargs)
+    table_mapping.enable_statistics(registry, unmapped_values=5)
+    chunks = [SOURCE.iloc[start:start + 100] for start in range(0, len(SOURCE), 100)]
+    with ParallelMapper([table_mapping], max_workers=2, max_pending=3) as parallel_mapper:
+        mapped = parallel_mapper.map_tables({'person': chunks})
+    assert len(mapped['person']) == 1000
+    [statistics] = registry.collect()
+    assert (statistics.calls, statistics.mapped, statistics.unmapped, statistics.null) \
+        == (1000, 400, 400, 200)
+    assert sorted(statistics.unmapped_values.top()) == [('unknown', 200, 0), ('x', 200, 0)]
+    assert '1000 values' in registry.report()
+
+
+def test_statistics_match_a_serial_run():
+    serial, parallel = StatisticsRegistry(), StatisticsRegistry()
+    serial_mapping, parallel_mapping = _person_mapping(), _person_mapping()
+    serial_mapping.enable_statistics(serial)
+    parallel_mapping.enable_statistics(parallel)
+    serial_mapping.map_chunk(SOURCE)
+    with ParallelMapper([parallel_mapping], max_workers=2) as parallel_mapper:
+        parallel_mapper.map_tables({'person': [SOURCE.iloc[:300], SOURCE.iloc[300:]]})
+    [expected], [statistics] = serial.collect(), parallel.collect()
+    assert (statistics.calls, statistics.mapped, statistics.unmapped, statistics.null) \
+        == (expected.calls, expected.mapped, expected.unmapped, expected.null)
+
+
+def test_statistics_collected_before_starting_the_workers():
+    registry = StatisticsRegistry()
+    table_mapping = _person_mapping()
+    table_mapping.enable_statistics(registry, unmapped_values=5)
+    table_mapping.map_chunk(SOURCE.iloc[:100])
+    with ParallelMapper([table_mapping], max_workers=2) as parallel_mapper:
+        parallel_mapper.map_tables({'person': [SOURCE.iloc[:50], SOURCE.iloc[50:100]]})
+    [statistics] = registry.collect()
+    assert (statistics.calls, statistics.mapped, statistics.unmapped, statistics.null) \
+        == (200, 80, 80, 40)
+    assert sorted(statistics.unmapped_values.top()) == [('unknown', 40, 0), ('x', 40, 0)]
+
+
+def test_statistics_enabled_after_starting_the_workers():
+    table_mapping = _person_mapping()
+    with ParallelMapper([table_mapping], max_workers=1) as parallel_mapper:
+        table_mapping.enable_statistics(StatisticsRegistry())
+        with pytest.raises(ValueError, match='before creating'):
+            parallel_mapper.map_tables({'person': [SOURCE]})
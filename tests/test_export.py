@@ -0,0 +1,70 @@
+import pandas as pd
+import pytest
+
+pa = pytest.importorskip('pyarrow')
+pq = pytest.importorskip('pyarrow.parquet')
+
+from pancaim_cdm.export import export_database, export_table, to_arrow  # noqa: E402
+from pancaim_cdm.loader import bulk_load  # noqa: E402
+from pancaim_cdm.pancaim_orm import Lab, Person  # noqa: E402
+
+
+def test_export_mapped_rows(tmp_path):
+    frame = pd.DataFrame({'pancaim_id': [1, 2], 'lab_date': ['2020-01-05', '2021-02-03'],
+                          'lab_date_raw_value': ['05-01-2020', '2021-02-03'], 'albumin': [1.5, None]})
+    assert export_table(Lab, [frame], tmp_path) == 2
+    table = pq.read_table(tmp_path / 'lab.parquet')
+    assert table.column('albumin').to_pylist() == [1.5, None]
+    # surrogate keys are assigned when loading
+    assert table.column('lab_id').null_count == 2
+
+
+def test_required_field_with_missing_values(tmp_path):
+    frame = pd.DataFrame({'pancaim_id': [1, 2], 'lab_date': ['2020-01-05', None],
+                          'lab_date_raw_value': ['2020-01-05', 'garbage']})
+    with pytest.raises(ValueError, match='lab.lab_date'):
+        export_table(Lab, [frame], tmp_path)
+
+
+def test_missing_required_field():
+    with pytest.raises(ValueError, match='person.sex'):
+        to_arrow(Person, pd.DataFrame({'pancaim_id': [1]}))
+
+
+def test_dates_before_year_1000(tmp_path):
+    frame = pd.DataFrame({'pancaim_id': [1, 2], 'lab_date': ['0202-01-05', '2020-01'],
+                          'lab_date_raw_value': ['0202-01-05', '2020-01']})
+    export_table(Lab, [frame], tmp_path)
+    dates = pq.read_table(tmp_path / 'lab.parquet').column('lab_date').to_pylist()
+    assert [(value.year, value.month, value.day) for value in dates] == [(202, 1, 5), (2020, 1, 1)]
+
+
+def _partition_files(directory) -> list:
+    return sorted(str(path.relative_to(directory)) for path in directory.rglob('*.parquet'))
+
+
+def test_partitions_with_a_bounded_number_of_open_files(tmp_path):
+    frame = pd.DataFrame({'pancaim_id': [1, 15, 25, 2, 16], 'sex': 'Male'})
+    chunks = [frame.iloc[:3], frame.iloc[3:]]
+    assert export_table(Person, chunks, tmp_path, partition_size=10, max_open_files=2) == 5
+    # unsorted rows: partitions are closed, and written to again in a new file
+    assert _partition_files(tmp_path) == ['person/pancaim_id_range=0/part-1.parquet',
+                                          'person/pancaim_id_range=0/part.parquet',
+                                          'person/pancaim_id_range=10/part-1.parquet',
+                                          'person/pancaim_id_range=10/part.parquet',
+                                          'person/pancaim_id_range=20/part.parquet']
+    table = pq.read_table(tmp_path / 'person')
+    assert sorted(table.column('pancaim_id').to_pylist()) == [1, 2, 15, 16, 25]
+
+
+def test_export_database_partitions(cdm_engine, tmp_path):
+    bulk_load(cdm_engine, Person, pd.DataFrame({'pancaim_id': [25, 1, 15, 2, 16], 'sex': 'Male'}))
+    row_counts = export_database(cdm_engine, tmp_path, models=[Person, Lab], chunk_size=2,
+                                 partition_size=10, max_open_files=1)
+    assert row_counts == {'person': 5, 'lab': 0}
+    # rows are read sorted by pancaim_id, so each partition has a single file
+    assert _partition_files(tmp_path) == ['person/pancaim_id_range=0/part.parquet',
+                                          'person/pancaim_id_range=10/part.parquet',
+                                          'person/pancaim_id_range=20/part.parquet']
+    table = pq.read_table(tmp_path / 'person' / 'pancaim_id_range=10')
+    assert table.column('pancaim_id').to_pylist() == [15, 16]
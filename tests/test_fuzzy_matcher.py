@@ -0,0 +1,69 @@
+import pickle
+
+import pytest
+
+from pancaim_cdm.pancaim_orm import Person, Surgery
+from pancaim_cdm.semantic_mapping import SemanticMapper
+from pancaim_cdm.semantic_mapping.fuzzy_matcher import FuzzyMatcher, normalize_value
+from pancaim_cdm.semantic_mapping.unmapped_value import UNMAPPED_VALUE
+
+
+@pytest.fixture
+def technique_mapper():
+    return SemanticMapper(Surgery.surgical_technique, {}, fuzzy_matching=True)
+
+
+def test_normalize_value():
+    assert normalize_value(' Whipple-procedure ') == 'whipple procedure'
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('whipple ', 'Whipple'),
+    ('WHIPPLE', 'Whipple'),
+    ('Whipple-procedure', 'Whipple'),
+    ('distaal', 'Distal'),
+    ('total resections', 'Total resection'),
+])
+def test_spelling_variants(technique_mapper, value, expected):
+    assert technique_mapper.lookup(value) == expected
+
+
+@pytest.mark.parametrize('value', [
+    'no whipple',
+    'whipple not performed',
+    'Total resection not done',
+    'geen whipple',
+])
+def test_negated_values_are_not_matched(technique_mapper, value):
+    assert technique_mapper.lookup(value) == UNMAPPED_VALUE
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('Femal', 'Female'),
+    ('Males', 'Male'),
+    ('not male', UNMAPPED_VALUE),
+    ('non-male', UNMAPPED_VALUE),
+])
+def test_sex(value, expected):
+    assert SemanticMapper(Person.sex, {}, fuzzy_matching=True).lookup(value) == expected
+
+
+def test_partial_match_needs_to_cover_most_of_the_value(technique_mapper):
+    assert technique_mapper.lookup('whipple procedure performed') == UNMAPPED_VALUE
+
+
+def test_ambiguous_values_are_not_matched(technique_mapper):
+    # close to both Distal and Total resection
+    assert technique_mapper.lookup('distal resection') == UNMAPPED_VALUE
+
+
+def test_candidate_with_negation():
+    matcher = FuzzyMatcher({'not applicable': 'NA', 'applicable': 'A'})
+    assert matcher.get('not aplicable') == 'NA'
+    assert matcher.get('aplicable') == 'A'
+
+
+def test_no_match_survives_pickling():
+    matcher = pickle.loads(pickle.dumps(FuzzyMatcher({'male': 'M'})))
+    assert matcher.get('zzz', 'default') == 'default'
+    assert matcher.get('zzz', 'default') == 'default'
@@ -0,0 +1,11 @@
+import pytest
+
+from benchmarks.import_time import BUDGET, IMPORT_CHECKS, measure
+
+
+@pytest.mark.parametrize('module', IMPORT_CHECKS)
+def test_cold_import(module):
+    run = measure(module, repeat=5)
+    loaded = [heavy for heavy in IMPORT_CHECKS[module] if heavy in run['modules']]
+    assert not loaded, f'{module} imports {", ".join(loaded)}'
+    assert run['seconds'] <= BUDGET
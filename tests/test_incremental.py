@@ -0,0 +1,87 @@
+import datetime
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import text
+
+from pancaim_cdm.dtypes import compact
+from pancaim_cdm.incremental import DeltaSummary, incremental_load, load_fingerprints, row_fingerprints
+from pancaim_cdm.pancaim_orm import Person, Surgery
+
+SURGERIES = pd.DataFrame({'surgery_id': [1, 2], 'pancaim_id': [1, 2],
+                          'date_of_surgery': ['2020-01-05', '2021-02-03'],
+                          'date_of_surgery_raw_value': ['05-01-2020', '2021-02-03'],
+                          'surgery_purpose': ['Radical', None],
+                          'year_of_surgery': [2019, None]})
+
+
+@pytest.mark.parametrize('frame', [
+    SURGERIES.assign(surgery_purpose=['Radical', np.nan]),
+    SURGERIES.assign(year_of_surgery=[2019.0, np.nan]),
+    SURGERIES.assign(year_of_surgery=pd.array([2019, None], dtype='Int32')),
+    SURGERIES.assign(year_of_surgery=pd.Series([Decimal(2019), None], dtype=object)),
+    SURGERIES.assign(date_of_surgery=[datetime.date(2020, 1, 5), datetime.date(2021, 2, 3)]),
+    compact(Surgery, SURGERIES),
+], ids=['nan', 'float', 'nullable-int', 'decimal', 'date', 'compact'])
+def test_fingerprints_do_not_depend_on_dtypes(frame):
+    expected = row_fingerprints(Surgery, SURGERIES)
+    pd.testing.assert_frame_equal(row_fingerprints(Surgery, frame), expected)
+
+
+def test_fingerprints_of_changed_values():
+    expected = row_fingerprints(Surgery, SURGERIES)['row_hash'].tolist()
+    for changed in (SURGERIES.assign(year_of_surgery=[2019, 2018]),
+                    SURGERIES.assign(surgery_purpose=['Radical', 'Palliative']),
+                    SURGERIES.assign(surgery_purpose=['Radical', ''])):
+        row_hash = row_fingerprints(Surgery, changed)['row_hash'].tolist()
+        assert row_hash[0] == expected[0]
+        assert row_hash[1] != expected[1]
+
+
+PERSONS = pd.DataFrame({'pancaim_id': [1, 2], 'sex': 'Male'})
+
+
+def _surgeries(engine):
+    with engine.connect() as connection:
+        rows = connection.execute(text(
+            'SELECT surgery_id, year_of_surgery FROM cdm_schema.surgery ORDER BY surgery_id')).fetchall()
+    return [tuple(row) for row in rows]
+
+
+def test_incremental_load(cdm_engine):
+    assert incremental_load(cdm_engine, Person, [PERSONS]) == DeltaSummary(inserted=2)
+    assert incremental_load(cdm_engine, Surgery, [SURGERIES]) == DeltaSummary(inserted=2)
+    # the same rows with other dtypes are unchanged
+    assert incremental_load(cdm_engine, Surgery, [compact(Surgery, SURGERIES)]) == DeltaSummary(unchanged=2)
+    changed = SURGERIES.iloc[:1].assign(year_of_surgery=2018)
+    assert incremental_load(cdm_engine, Surgery, [changed]) == DeltaSummary(updated=1, deleted=1)
+    assert _surgeries(cdm_engine) == [(1, 2018)]
+    with cdm_engine.connect() as connection:
+        assert load_fingerprints(connection, 'surgery').index.tolist() == [1]
+
+
+def _failing(chunks):
+    yield from chunks
+    raise RuntimeError('crash')
+
+
+def test_failed_load_is_rolled_back_with_its_fingerprints(cdm_engine):
+    incremental_load(cdm_engine, Person, [PERSONS])
+    with pytest.raises(RuntimeError):
+        incremental_load(cdm_engine, Surgery, _failing([SURGERIES.iloc[:1]]))
+    assert _surgeries(cdm_engine) == []
+    # the next load starts over
+    assert incremental_load(cdm_engine, Surgery, [SURGERIES]) == DeltaSummary(inserted=2)
+    assert _surgeries(cdm_engine) == [(1, 2019), (2, None)]
+
+
+def test_rolled_back_transaction(cdm_engine):
+    incremental_load(cdm_engine, Person, [PERSONS])
+    with cdm_engine.connect() as connection:
+        transaction = connection.begin()
+        assert incremental_load(connection, Surgery, [SURGERIES]) == DeltaSummary(inserted=2)
+        transaction.rollback()
+    # the fingerprints were rolled back with the rows
+    assert incremental_load(cdm_engine, Surgery, [SURGERIES]) == DeltaSummary(inserted=2)
@@ -0,0 +1,42 @@
+import json
+import sys
+from pathlib import Path
+
+from sqlalchemy import func, select
+
+# the benchmark scripts import their modules from the benchmarks folder
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'benchmarks'))
+
+from load_benchmarks import MIN_ROWS, benchmark_loads, compare  # noqa: E402
+from pancaim_cdm.schema import create_schema  # noqa: E402
+from synthetic_data import MODELS  # noqa: E402
+from tests.conftest import sqlite_engine  # noqa: E402
+
+BASELINE = Path(__file__).resolve().parents[1] / 'benchmarks' / 'load_baseline_sqlite.json'
+
+
+def test_load_all_tables(cdm_engine):
+    results = benchmark_loads(cdm_engine, rows=500, repeat=2, chunk_size=200)
+    assert [result['name'] for result in results] == [f'load.{model.__tablename__}' for model in MODELS]
+    assert all(result['rows'] == 500 for result in results)
+    with cdm_engine.connect() as connection:
+        for model in MODELS:
+            assert connection.execute(select(func.count()).select_from(model.__table__)).scalar() == 500
+
+
+def test_load_throughput_against_the_baseline(tmp_path, capsys):
+    with open(BASELINE) as baseline_file:
+        rows = json.load(baseline_file)['rows']
+    assert rows >= MIN_ROWS
+    # a file database, as the baseline run
+    engine = sqlite_engine(str(tmp_path / 'cdm.db'))
+    create_schema(engine)
+    try:
+        results = benchmark_loads(engine, rows=rows, repeat=5, chunk_size=50_000)
+    finally:
+        engine.dispose()
+    # the baseline was recorded on another machine: only fail on a large drop
+    passed = compare({'database': 'sqlite', 'results': results}, str(BASELINE), threshold=0.5)
+    report = capsys.readouterr().out
+    assert 'TOO FEW ROWS' not in report
+    assert passed, report
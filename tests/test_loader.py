@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import text
+
+from pancaim_cdm.loader import _copy_values, bulk_load
+from pancaim_cdm.pancaim_orm import Lab, Person, Surgery
+
+YEAR_OF_SURGERY = Surgery.__table__.c.year_of_surgery
+
+
+@pytest.mark.parametrize('values', [
+    pd.Series([2019.0, np.nan]),
+    pd.Series([2019.0, None], dtype=object),
+    pd.Series([2019, None], dtype='Int64'),
+    pd.Series([2019.0, np.nan]).astype('category'),
+], ids=['float', 'object', 'nullable-int', 'category'])
+def test_copy_integers_with_missing_values(values):
+    assert _copy_values(values, YEAR_OF_SURGERY).tolist() == ['2019', '\\N']
+
+
+def test_copy_integers_outside_the_int64_range():
+    assert _copy_values(pd.Series([1e20, 5.0, np.nan]), YEAR_OF_SURGERY).tolist() \
+        == ['100000000000000000000', '5', '\\N']
+
+
+def test_copy_partial_dates():
+    lab_date = Lab.__table__.c.lab_date
+    assert _copy_values(pd.Series(['2020-01', '2021', '0202-01-05', None]), lab_date).tolist() \
+        == ['2020-01-01', '2021-01-01', '0202-01-05', '\\N']
+    assert _copy_values(pd.Series(pd.to_datetime(['2020-01-05', None])), lab_date).tolist() \
+        == ['2020-01-05', '\\N']
+
+
+def test_copy_values():
+    assert _copy_values(pd.Series([1.0, 2.5, None]), Lab.__table__.c.albumin).tolist() \
+        == ['1.0', '2.5', '\\N']
+    assert _copy_values(pd.Series(['a\tb', 'c\\d']), Surgery.__table__.c.surgery_purpose).tolist() \
+        == ['a\\tb', 'c\\\\d']
+
+
+def test_bulk_load(cdm_engine):
+    bulk_load(cdm_engine, Person, pd.DataFrame({'pancaim_id': [1, 2], 'sex': 'Male'}))
+    surgeries = pd.DataFrame({'pancaim_id': [1, 2], 'date_of_surgery': '2020-01-05',
+                              'date_of_surgery_raw_value': '2020-01-05',
+                              'year_of_surgery': [2019, np.nan]})
+    assert bulk_load(cdm_engine, Surgery, surgeries) == 2
+    with cdm_engine.connect() as connection:
+        rows = connection.execute(text(
+            'SELECT pancaim_id, year_of_surgery FROM cdm_schema.surgery ORDER BY pancaim_id')).fetchall()
+    assert [tuple(row) for row in rows] == [(1, 2019), (2, None)]
+
+
+def test_bulk_load_partial_dates(cdm_engine):
+    bulk_load(cdm_engine, Person, pd.DataFrame({'pancaim_id': [1], 'sex': 'Male'}))
+    labs = pd.DataFrame({'pancaim_id': [1, 1], 'lab_date': ['2020-01', '2021'],
+                         'lab_date_raw_value': ['01-2020', '2021']})
+    assert bulk_load(cdm_engine, Lab, labs) == 2
+    with cdm_engine.connect() as connection:
+        dates = connection.execute(text('SELECT lab_date FROM cdm_schema.lab ORDER BY lab_id')).scalars().all()
+    assert dates == ['2020-01-01', '2021-01-01']
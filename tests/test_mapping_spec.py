@@ -0,0 +1,68 @@
+import json
+
+import pandas as pd
+import pytest
+
+from pancaim_cdm.mapping_spec import MappingSpecError, compile_mapping_spec, load_mapping_spec, \
+    read_mapping_spec
+from pancaim_cdm.semantic_mapping.unmapped_value import UNMAPPED_VALUE
+
+YAML_SPEC = '''
+date_formats:
+  '%d-%m-%Y': YMD
+tables:
+  person:
+    copy_columns: {id: pancaim_id}
+    fields:
+      sex:
+        source: gender
+        fuzzy_matching: yes
+        mappings: {1: M, 2: F, yes: OTHER, 01: F, ~: OTHER}
+      date_of_death:
+        source: died
+'''
+
+
+def _spec(mappings):
+    return {'tables': {'person': {'fields': {'sex': {'source': 'gender', 'mappings': mappings}}}}}
+
+
+def test_yaml_keys_are_read_as_written(tmp_path):
+    pytest.importorskip('yaml')
+    path = tmp_path / 'mapping.yaml'
+    path.write_text(YAML_SPEC)
+    spec = read_mapping_spec(path)
+    sex = spec['tables']['person']['fields']['sex']
+    assert sex['fuzzy_matching'] is True
+    assert sex['mappings'] == {'1': 'M', '2': 'F', 'yes': 'OTHER', '01': 'F', None: 'OTHER'}
+    table_mapping = load_mapping_spec(path)['person']
+    mapped = table_mapping.map_chunk(pd.DataFrame({'id': [1, 2, 3, 4, 5, 6],
+                                                   'gender': ['1', '2', 'yes', '01', None, 'x'],
+                                                   'died': None}))
+    assert mapped['sex'].tolist() == ['Male', 'Female', 'Other', 'Female', 'Other', UNMAPPED_VALUE]
+
+
+def test_number_keys_are_converted():
+    table_mapping = compile_mapping_spec(_spec({1: 'M', 2.5: 'F'}))['person']
+    assert table_mapping.mappers['gender'].target_mappings == {'1': 'Male', '2.5': 'Female'}
+
+
+def test_invalid_keys_are_reported():
+    with pytest.raises(MappingSpecError) as error:
+        compile_mapping_spec(_spec({True: 'M', '2': 'F', 2: 'M'}))
+    assert any('True is not a string' in message for message in error.value.errors)
+    assert any("'2' is mapped more than once" in message for message in error.value.errors)
+
+
+def test_invalid_target(tmp_path):
+    path = tmp_path / 'mapping.json'
+    path.write_text(json.dumps(_spec({'m': 'Mal'})))
+    with pytest.raises(MappingSpecError, match="'Mal' is not a controlled term of Sex"):
+        load_mapping_spec(path)
+
+
+def test_compiled_spec_is_cached(tmp_path):
+    spec = _spec({'m': 'M'})
+    load_mapping_spec(spec, cache_dir=tmp_path)
+    assert len(list(tmp_path.glob('mapping-*.pickle'))) == 1
+    assert load_mapping_spec(spec, cache_dir=tmp_path)['person'].mappers['gender'].lookup('m') == 'Male'
@@ -0,0 +1,87 @@
+import pandas as pd
+import pytest
+from sqlalchemy import text
+
+from pancaim_cdm.loader import bulk_load
+from pancaim_cdm.orchestrator import OrchestrationError, Orchestrator, Site
+from pancaim_cdm.pancaim_orm import Base, Lab, Person
+from pancaim_cdm.pipeline import TableMapping
+from tests.conftest import sqlite_engine
+
+PERSONS = pd.DataFrame({'pancaim_id': range(1, 301), 'sex': 'Male'})
+LABS = pd.DataFrame({'pancaim_id': [pancaim_id % 300 + 1 for pancaim_id in range(1000)],
+                     'lab_date': '2020-01-01', 'lab_date_raw_value': '2020-01-01'})
+
+
+def _chunks(frame: pd.DataFrame):
+    return [frame.iloc[start:start + 100] for start in range(0, len(frame), 100)]
+
+
+def _identity(model, frame: pd.DataFrame) -> TableMapping:
+    return TableMapping(model, {}, {column: column for column in frame.columns})
+
+
+class FailOnce:
+    """Load function failing after loading one chunk of a table (i.e. before it is committed)."""
+
+    def __init__(self, model, chunk_number: int):
+        self.model = model
+        self.chunk_number = chunk_number
+        self.loaded = 0
+        self.failed = False
+
+    def __call__(self, connection, model, frame):
+        bulk_load(connection, model, frame)
+        if model is self.model:
+            self.loaded += 1
+            if self.loaded == self.chunk_number and not self.failed:
+                self.failed = True
+                raise RuntimeError('crash')
+
+
+def _site(name: str, path, load=bulk_load) -> Site:
+    engine = sqlite_engine(str(path), connect_args={'check_same_thread': False})
+    Base.metadata.create_all(engine)
+    return Site(name,
+                {'person': _identity(Person, PERSONS), 'lab': _identity(Lab, LABS)},
+                {'person': lambda: _chunks(PERSONS), 'lab': lambda: _chunks(LABS)},
+                engine, load)
+
+
+def _counts(site: Site):
+    with site.engine.connect() as connection:
+        return [connection.execute(text(f'SELECT count(*) FROM cdm_schema.{table_name}')).scalar()
+                for table_name in ('person', 'lab')]
+
+
+@pytest.mark.parametrize('model', [Person, Lab])
+def test_resume_after_failure(tmp_path, model):
+    failing = _site('a', tmp_path / 'a.db', FailOnce(model, 2))
+    other = _site('b', tmp_path / 'b.db')
+    with pytest.raises(OrchestrationError) as error:
+        Orchestrator([failing, other], max_workers=2).run()
+    assert list(error.value.errors) == [('a', model.__tablename__)]
+    assert _counts(other) == [300, 1000]
+    # the failed chunk was rolled back with its checkpoint, so it is loaded once
+    row_counts = Orchestrator([failing, other], max_workers=2).run()
+    assert row_counts[('a', 'person')] == 300
+    assert row_counts[('a', 'lab')] == 1000
+    assert _counts(failing) == [300, 1000]
+    assert _counts(other) == [300, 1000]
+
+
+def test_completed_tables_are_skipped(tmp_path):
+    site = _site('a', tmp_path / 'a.db')
+    Orchestrator([site]).run()
+    site.sources = {'person': lambda: pytest.fail('person is loaded'),
+                    'lab': lambda: pytest.fail('lab is loaded')}
+    assert Orchestrator([site]).run() == {('a', 'person'): 300, ('a', 'lab'): 1000}
+
+
+def test_sites_share_a_database(tmp_path):
+    first = _site('a', tmp_path / 'cdm.db')
+    second = Site('b', {'person': _identity(Person, PERSONS)},
+                  {'person': lambda: _chunks(PERSONS.assign(pancaim_id=PERSONS.pancaim_id + 1000))},
+                  first.engine)
+    Orchestrator([first, second]).run()
+    assert _counts(first) == [600, 1000]
@@ -0,0 +1,100 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from pancaim_cdm.pancaim_orm import Person
+from pancaim_cdm.pipeline import TableMapping, prefetch, read_source_chunks, run_pipeline
+from pancaim_cdm.semantic_mapping import SemanticMapper
+from pancaim_cdm.semantic_mapping.controlled_terms.person import Sex
+
+
+def _table_mapping() -> TableMapping:
+    return TableMapping(Person, {'gender': SemanticMapper(Person.sex, {'m': Sex.M, 'NA': Sex.OTHER})},
+                        {'patient_id': 'pancaim_id'})
+
+
+def _chunks(count: int, size: int = 10):
+    for number in range(count):
+        yield pd.DataFrame({'patient_id': range(number * size, (number + 1) * size), 'gender': 'm'},
+                           index=range(number * size, (number + 1) * size))
+
+
+def _wait_for_prefetch_threads(timeout: float = 2.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if not any(thread.name == 'pancaim-cdm-prefetch' for thread in threading.enumerate()):
+            return True
+        time.sleep(0.01)
+    return False
+
+
+@pytest.mark.parametrize('size', [1, 3])
+def test_prefetch_order(size):
+    assert list(prefetch(iter(range(100)), size)) == list(range(100))
+    assert _wait_for_prefetch_threads()
+
+
+def test_prefetch_producer_error():
+    def produce():
+        yield 1
+        yield 2
+        raise KeyError('broken source')
+
+    consumed = []
+    with pytest.raises(KeyError, match='broken source'):
+        for item in prefetch(produce()):
+            consumed.append(item)
+    assert consumed == [1, 2]
+    assert _wait_for_prefetch_threads()
+
+
+def test_prefetch_stops_when_the_consumer_stops():
+    produced = []
+
+    def produce():
+        for item in range(1000):
+            produced.append(item)
+            yield item
+
+    items = prefetch(produce(), size=2)
+    assert next(items) == 0
+    items.close()
+    assert _wait_for_prefetch_threads()
+    # the producer stopped after filling the queue
+    assert len(produced) < 10
+
+
+@pytest.mark.parametrize('prefetch_size', [0, 2])
+def test_run_pipeline(prefetch_size):
+    mapped = []
+    assert run_pipeline(_chunks(5), _table_mapping(), mapped.append, prefetch_size) == 50
+    frame = pd.concat(mapped)
+    assert frame['pancaim_id'].tolist() == list(range(50))
+    assert (frame['sex'] == 'Male').all()
+
+
+@pytest.mark.parametrize('prefetch_size', [0, 2])
+def test_run_pipeline_sink_error(prefetch_size):
+    def sink(chunk):
+        if chunk['pancaim_id'].iloc[0] == 20:
+            raise RuntimeError('sink failed')
+
+    with pytest.raises(RuntimeError, match='sink failed'):
+        run_pipeline(_chunks(1000), _table_mapping(), sink, prefetch_size)
+    assert _wait_for_prefetch_threads()
+
+
+def test_read_source_chunks(tmp_path):
+    path = tmp_path / 'person.csv'
+    path.write_text('patient_id,gender\n1,m\n2,NA\n3,\n4,null\n5,m\n')
+    chunks = list(read_source_chunks(path, chunk_size=2))
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    frame = pd.concat(chunks)
+    # only empty values are missing; null markers are kept as source values
+    assert frame['gender'].fillna('').tolist() == ['m', 'NA', '', 'null', 'm']
+    assert frame['gender'].isna().tolist() == [False, False, True, False, False]
+    mapped = _table_mapping().map_chunk(frame)
+    assert mapped['sex'].tolist()[:2] == ['Male', 'Other']
+    assert mapped['sex_raw_value'].tolist()[3] == 'null'
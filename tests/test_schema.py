@@ -0,0 +1,49 @@
+import pytest
+from sqlalchemy import inspect
+
+from pancaim_cdm.pancaim_orm import CDM_SCHEMA, Base
+from pancaim_cdm.schema import create_schema
+from tests.conftest import sqlite_engine
+
+
+@pytest.fixture
+def engine():
+    """In-memory SQLite database without the CDM tables."""
+    engine = sqlite_engine()
+    yield engine
+    engine.dispose()
+
+
+def _declared_indexes(table) -> set:
+    return {index.name for index in table.indexes}
+
+
+def test_create_schema(engine):
+    create_schema(engine)
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        assert inspector.has_table(table.name, schema=CDM_SCHEMA)
+        indexes = {index['name'] for index in inspector.get_indexes(table.name, schema=CDM_SCHEMA)}
+        assert _declared_indexes(table) <= indexes
+        assert len(inspector.get_foreign_keys(table.name, schema=CDM_SCHEMA)) \
+            == len(table.foreign_key_constraints)
+    assert any(_declared_indexes(table) for table in Base.metadata.sorted_tables)
+    # existing tables are left as they are
+    create_schema(engine)
+
+
+def test_create_schema_in_bulk_load_mode(engine):
+    create_schema(engine, bulk_load_mode=True)
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        assert inspector.has_table(table.name, schema=CDM_SCHEMA)
+        assert inspector.get_indexes(table.name, schema=CDM_SCHEMA) == []
+        assert inspector.get_foreign_keys(table.name, schema=CDM_SCHEMA) == []
+
+
+def test_bulk_load_mode_requires_an_empty_schema(engine):
+    Base.metadata.tables[f'{CDM_SCHEMA}.person'].create(engine)
+    with pytest.raises(ValueError, match='requires an empty schema'):
+        create_schema(engine, bulk_load_mode=True)
+    # nothing else was created
+    assert inspect(engine).get_table_names(schema=CDM_SCHEMA) == ['person']
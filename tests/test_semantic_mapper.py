@@ -0,0 +1,161 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pancaim_cdm.pancaim_orm import Lab, Person, Surgery
+from pancaim_cdm.semantic_mapping import SemanticMapper
+from pancaim_cdm.semantic_mapping.controlled_terms.person import Sex, VitalStatus
+from pancaim_cdm.semantic_mapping.controlled_terms.surgery import SurgicalTechnique
+from pancaim_cdm.semantic_mapping.date_format import DateFormat
+from pancaim_cdm.semantic_mapping.unmapped_value import UNMAPPED_VALUE
+
+TERMS = ['m', 'f', ' M ', 'Female', 'x', 'unk', '', '  ', 'null']
+NUMBERS = ['1', ' 2 ', '2.0', '1.5', 'yes', 'no', 'true', 'abc', '<5', '99999999999999999999']
+DATES = ['2020-01-05', '05-01-2020', '2020-02-30', '2020', '2020-1-5', ' 2020-01-05',
+         '2020-01-05x', 'garbage', 'nulldate', 'fixed']
+SURGICAL_TECHNIQUES = ['Whipple', 'whipple procedure', 'Whipple-procedure', 'distaal',
+                       'not whipple', 'Total resection not done', 'distal resection', 'other']
+# non-string source values (e.g. of a column read with type inference)
+OTHER_VALUES = [None, np.nan, pd.NA, pd.NaT, 1, 1.0, 2.5, True, datetime.datetime(2020, 1, 1)]
+
+# field kinds: controlled term, nullable controlled term, other, date
+MAPPERS = {
+    'controlled-term': ((Person.sex, {'m': Sex.M, 'f': Sex.F, 'M': Sex.M, None: Sex.OTHER,
+                                      'unk': None}), {}, TERMS),
+    'nullable-controlled-term': ((Person.vital_status, {'alive': VitalStatus.ALIVE, 'unk': None,
+                                                        'x': 'Dead'}), {}, TERMS),
+    'nullable-controlled-term-null-mapping': ((Person.vital_status, {None: 'Dead', 'm': VitalStatus.ALIVE}),
+                                              {}, TERMS),
+    'integer': ((Person.ecog_scale, {'m': 1, 'f': None, '1': 3}), {}, TERMS + NUMBERS),
+    'date': ((Lab.lab_date, {'nulldate': None, 'fixed': '2021-03-04'},
+              {'%Y-%m-%d': DateFormat.YMD, '%d-%m-%Y': DateFormat.YMD, '%Y': DateFormat.Y}), {}, DATES),
+    'nullable-date': ((Person.date_of_birth, {'m': 'x'}, {'%Y-%m-%d': DateFormat.YM}), {},
+                      DATES + TERMS),
+    'integer-coercion': ((Person.ecog_scale, {'unknown': None}), {'coerce_types': True},
+                         TERMS + NUMBERS),
+    'numeric-coercion': ((Person.age_at_diagnosis,), {'coerce_types': True}, TERMS + NUMBERS),
+    'boolean-coercion': ((Person.surgery, {'done': True}), {'coerce_types': True},
+                         TERMS + NUMBERS + ['done']),
+    'fuzzy-matching': ((Surgery.surgical_technique, {'PPPD': SurgicalTechnique.WHIPPLE}),
+                       {'fuzzy_matching': True}, SURGICAL_TECHNIQUES + ['PPPD'] + TERMS),
+}
+
+
+def _same(expected, actual) -> bool:
+    return (expected is actual or expected == actual) and type(expected) is type(actual)
+
+
+def _assert_equivalent(mapper: SemanticMapper, values: pd.Series) -> None:
+    expected = [mapper.lookup(value) for value in values]
+    mapped = mapper.map_series(values)
+    assert list(mapped.index) == list(values.index)
+    assert mapped.name == mapper.field_name
+    different = [(value, expected_value, mapped_value)
+                 for value, expected_value, mapped_value in zip(values, expected, mapped)
+                 if not _same(expected_value, mapped_value)]
+    assert not different
+
+
+@pytest.fixture(params=[False, True], ids=['rows', 'factorize'])
+def factorize(request):
+    return request.param
+
+
+@pytest.mark.parametrize('name', MAPPERS)
+def test_map_series_equals_lookup(name, factorize):
+    args, kwargs, source_values = MAPPERS[name]
+    mapper = SemanticMapper(*args, factorize=factorize, **kwargs)
+    rng = np.random.default_rng(0)
+    strings = pd.Series(rng.choice(np.array(source_values + [None], dtype=object), 500),
+                        index=range(5, 505))
+    _assert_equivalent(mapper, strings)
+    mixed = pd.Series(rng.choice(np.array(source_values + OTHER_VALUES, dtype=object), 500))
+    _assert_equivalent(mapper, mixed)
+    for values in (pd.Series(rng.random(50)),
+                   pd.Series([1, 2, None], dtype='Int64'),
+                   pd.Series(pd.date_range('2020-01-01', periods=50)),
+                   pd.Series([], dtype=object)):
+        _assert_equivalent(mapper, values)
+
+
+@pytest.mark.parametrize('name', MAPPERS)
+def test_map_categorical_series_equals_lookup(name, factorize):
+    args, kwargs, source_values = MAPPERS[name]
+    mapper = SemanticMapper(*args, factorize=factorize, **kwargs)
+    values = pd.Series(source_values * 3 + [None], dtype='category')
+    _assert_equivalent(mapper, values)
+    # unused categories, and categories that are not strings
+    _assert_equivalent(mapper, values.iloc[:5].cat.add_categories(['unused']))
+    _assert_equivalent(mapper, pd.Series([1, 2, 1, None], dtype='category'))
+
+
+@pytest.mark.parametrize('name', MAPPERS)
+def test_raw_values(name, factorize):
+    args, kwargs, source_values = MAPPERS[name]
+    mapper = SemanticMapper(*args, factorize=factorize, **kwargs)
+    if mapper.raw_field_name is None:
+        pytest.skip('field without raw value')
+    values = pd.Series(source_values + [None, 1.0])
+    mapped = mapper.map_series(values, raw_values=True)
+    assert list(mapped.columns) == [mapper.field_name, mapper.raw_field_name]
+    assert mapped[mapper.raw_field_name].tolist() \
+        == [SemanticMapper._clean_value(value) for value in values]
+
+
+def test_placeholder_value():
+    mapper = SemanticMapper(Person.sex, {'m': Sex.M})
+    assert mapper.map_series(pd.Series(['m', 'x', None])).tolist() \
+        == ['Male', UNMAPPED_VALUE, UNMAPPED_VALUE]
+
+
+def test_cached_lookup():
+    mapper = SemanticMapper(Person.sex, {'m': Sex.M, 'f': Sex.F}, cache_size=2)
+    assert [mapper.lookup(value) for value in ['m', 'f', 'm', 'x', 'm']] \
+        == ['Male', 'Female', 'Male', UNMAPPED_VALUE, 'Male']
+    info = mapper.cache_info()
+    # 'x' evicted 'f', the least recently used value
+    assert (info.hits, info.misses, info.maxsize, info.currsize) == (2, 3, 2, 2)
+    assert mapper.lookup('f') == 'Female'
+    assert mapper.cache_info().misses == 4
+    mapper.cache_clear()
+    info = mapper.cache_info()
+    assert (info.hits, info.misses, info.currsize) == (0, 0, 0)
+    assert SemanticMapper(Person.sex, {'m': Sex.M}).cache_info() is None
+
+
+def test_cached_lookup_of_unhashable_values():
+    mapper = SemanticMapper(Person.sex, {'m': Sex.M}, cache_size=2)
+    assert mapper.lookup(['m']) == UNMAPPED_VALUE
+    assert mapper.cache_info().currsize == 0
+
+
+def test_cached_lookup_errors_are_raised():
+    # a TypeError of the lookup itself is not mistaken for an unhashable value
+    calls = []
+
+    def lookup(source_value):
+        calls.append(source_value)
+        raise TypeError('broken lookup')
+
+    cached_lookup = SemanticMapper(Person.sex, {'m': Sex.M})._cache_lookup(lookup, 2)
+    with pytest.raises(TypeError, match='broken lookup'):
+        cached_lookup('m')
+    assert calls == ['m']
+
+
+def test_strings_are_mapped_once_per_distinct_value(monkeypatch):
+    mapper = SemanticMapper(Person.sex, {'m': Sex.M})
+    sizes = []
+    map_values = mapper._map_values
+
+    def record_map_values(cleaned, present):
+        sizes.append(len(cleaned))
+        return map_values(cleaned, present)
+
+    monkeypatch.setattr(mapper, '_map_values', record_map_values)
+    assert mapper.map_series(pd.Series(['m', ' m', None] * 1000)).tolist() \
+        == ['Male', 'Male', UNMAPPED_VALUE] * 1000
+    # the distinct strings, and the missing value
+    assert sizes == [3]
@@ -0,0 +1,53 @@
+import pickle
+import random
+from collections import Counter
+
+from pancaim_cdm.semantic_mapping.statistics import SpaceSaving
+
+
+def _skewed_stream(length: int, seed: int = 0):
+    rng = random.Random(seed)
+    return [int(rng.paretovariate(1.2)) for _ in range(length)]
+
+
+def test_space_saving_bounds():
+    stream = _skewed_stream(50_000)
+    exact = Counter(stream)
+    sketch = SpaceSaving(20)
+    for value in stream:
+        sketch.add(value)
+    assert len(sketch.counts) == 20
+    assert sum(sketch.counts.values()) == len(stream)
+    for value, count, error in sketch.top():
+        assert count - error <= exact[value] <= count
+    # values occurring more than total / capacity times are tracked
+    assert {value for value, count in exact.items() if count > len(stream) / 20} \
+        <= set(sketch.counts)
+
+
+def test_space_saving_update_equals_add():
+    stream = _skewed_stream(5_000, seed=1)
+    added, updated = SpaceSaving(10), SpaceSaving(10)
+    for value in stream:
+        added.add(value)
+    for start in range(0, len(stream), 500):
+        updated.update(Counter(stream[start:start + 500]).items())
+    assert sum(updated.counts.values()) == sum(added.counts.values())
+    assert [value for value, _, _ in updated.top(3)] == [value for value, _, _ in added.top(3)]
+
+
+def test_space_saving_distinct_values():
+    # every new value evicts one, without growing the heap
+    sketch = SpaceSaving(100)
+    for value in range(100_000):
+        sketch.add(value)
+    assert len(sketch.counts) == len(sketch._heap) == 100
+    assert max(sketch.counts.values()) <= 1001
+
+
+def test_space_saving_merge_and_pickle():
+    first, second = SpaceSaving(5), SpaceSaving(5)
+    first.update([('a', 10), ('b', 3)])
+    second.update([('a', 5), ('c', 7)])
+    first.merge(pickle.loads(pickle.dumps(second)))
+    assert first.top() == [('a', 15, 0), ('c', 7, 0), ('b', 3, 0)]
@@ -0,0 +1,51 @@
+import datetime
+
+import pandas as pd
+from sqlalchemy import func, inspect, select
+
+from pancaim_cdm.loader import bulk_load
+from pancaim_cdm.pancaim_orm import CDM_SCHEMA, Lab, Person, Surgery
+from pancaim_cdm.timeline import TIMELINE, create_timeline, drop_timeline, refresh_timeline, timeline
+
+
+def _load(engine) -> None:
+    bulk_load(engine, Person, pd.DataFrame({'pancaim_id': [1, 2], 'sex': 'Male'}))
+    bulk_load(engine, Lab, pd.DataFrame({'lab_id': [1, 2, 3], 'pancaim_id': [1, 1, 2],
+                                         'lab_date': ['2020-03-01', '2020-01-01', '2020-02-01'],
+                                         'lab_date_raw_value': 'raw'}))
+    bulk_load(engine, Surgery, pd.DataFrame({'surgery_id': [1], 'pancaim_id': [1],
+                                             'date_of_surgery': ['2020-02-01'],
+                                             'date_of_surgery_raw_value': 'raw'}))
+
+
+def _events(engine, pancaim_id: int) -> list:
+    query = (select(timeline.c.event_date, timeline.c.event_table, timeline.c.event_id)
+             .where(timeline.c.pancaim_id == pancaim_id)
+             .order_by(timeline.c.event_date))
+    with engine.connect() as connection:
+        return [tuple(row) for row in connection.execute(query)]
+
+
+def test_timeline(cdm_engine):
+    _load(cdm_engine)
+    create_timeline(cdm_engine)
+    indexes = {index['name'] for index in inspect(cdm_engine).get_indexes(TIMELINE, schema=CDM_SCHEMA)}
+    assert f'ix_{TIMELINE}_pancaim_id_event_date' in indexes
+    assert _events(cdm_engine, 1) == [(datetime.date(2020, 1, 1), 'lab', 2),
+                                      (datetime.date(2020, 2, 1), 'surgery', 1),
+                                      (datetime.date(2020, 3, 1), 'lab', 1)]
+    assert _events(cdm_engine, 2) == [(datetime.date(2020, 2, 1), 'lab', 3)]
+
+    bulk_load(cdm_engine, Lab, pd.DataFrame({'lab_id': [4], 'pancaim_id': [2], 'lab_date': ['2019-12-01'],
+                                             'lab_date_raw_value': 'raw'}))
+    assert len(_events(cdm_engine, 2)) == 1
+    refresh_timeline(cdm_engine)
+    assert _events(cdm_engine, 2) == [(datetime.date(2019, 12, 1), 'lab', 4),
+                                      (datetime.date(2020, 2, 1), 'lab', 3)]
+    with cdm_engine.connect() as connection:
+        assert connection.execute(select(func.count()).select_from(timeline)).scalar() == 5
+
+    drop_timeline(cdm_engine)
+    assert not inspect(cdm_engine).has_table(TIMELINE, schema=CDM_SCHEMA)
+    # dropping a dropped timeline is a no-op
+    drop_timeline(cdm_engine)
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from pancaim_cdm.semantic_mapping.type_coercion import TypeCoercer
+
+VALUES = {
+    '5': (5, 5.0),
+    '+7': (7, 7.0),
+    '-3': (-3, -3.0),
+    '2.0': (2, 2.0),
+    '2.5': (None, 2.5),
+    '.5': (None, 0.5),
+    '4,5 mmol/L': (None, 4.5),
+    '1.000,5': (None, 1000.5),
+    '12 kg': (12, 12.0),
+    '99999999999999999999': (99999999999999999999, 1e20),
+    '-99999999999999999999': (-99999999999999999999, -1e20),
+    # exponents
+    '1.5E+03': (1500, 1500.0),
+    '5.2e9': (5200000000, 5.2e9),
+    '1e-3': (None, 0.001),
+    '2,5e2 mg': (250, 250.0),
+    '1e400': (None, None),
+    # separators
+    '1,5': (None, 1.5),
+    '1,000,000': (1000000, 1e6),
+    '1.000.000': (1000000, 1e6),
+    '1.000.000,25': (None, 1000000.25),
+    '1,000,000.25': (None, 1000000.25),
+    '1,5,6': (None, None),
+    '1,00,000': (None, None),
+    '1.000,000.5': (None, None),
+    # units
+    '12kg': (12, 12.0),
+    '4.5 x10^9/L': (None, 4.5),
+    '0x1F': (None, None),
+    # censored values
+    '<5': (None, None),
+    '>= 3': (None, None),
+    '≤2': (None, None),
+    'abc': (None, None),
+    'yes': (None, None),
+}
+
+
+@pytest.mark.parametrize('value', VALUES)
+@pytest.mark.parametrize('field_type', ['integer', 'numeric'])
+def test_coerce_numbers(field_type, value):
+    expected = VALUES[value][field_type == 'numeric']
+    coercer = TypeCoercer(field_type)
+    coerced = coercer.coerce_value(value)
+    assert coerced == expected and type(coerced) is type(expected)
+    [vectorized] = coercer.coerce(np.array([value], dtype=object))
+    assert vectorized == expected and type(vectorized) is type(expected)
+
+
+def test_coerce_booleans():
+    values = ['yes', 'Nee', 'TRUE', '0', 'maybe']
+    coercer = TypeCoercer('boolean')
+    assert [coercer.coerce_value(value) for value in values] == [True, False, True, False, None]
+    assert coercer.coerce(np.array(values, dtype=object)).tolist() == [True, False, True, False, None]
+
+
+def test_unknown_field_type():
+    with pytest.raises(ValueError, match='Unknown field type'):
+        TypeCoercer('text')
@@ -0,0 +1,86 @@
+import pandas as pd
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.pool import QueuePool
+
+from pancaim_cdm.pancaim_orm import Base, Lab, Person, Tumor
+from pancaim_cdm.pipeline import TableMapping
+from pancaim_cdm.writer import PipelinedWriter, create_loading_engine, foreign_key_order, load_tables
+from tests.conftest import attach_cdm_schema
+
+PERSONS = pd.DataFrame({'pancaim_id': range(1, 301), 'sex': 'Male'})
+LABS = pd.DataFrame({'pancaim_id': [pancaim_id % 300 + 1 for pancaim_id in range(1000)],
+                     'lab_date': '2020-01-01', 'lab_date_raw_value': '2020-01-01'})
+
+
+def _chunks(frame: pd.DataFrame, size: int = 100):
+    return (frame.iloc[start:start + size] for start in range(0, len(frame), size))
+
+
+def _identity(model, frame: pd.DataFrame) -> TableMapping:
+    return TableMapping(model, {}, {column: column for column in frame.columns})
+
+
+@pytest.fixture
+def engine(tmp_path):
+    path = str(tmp_path / 'cdm.db')
+    # enforce foreign keys, so loading a table before the tables it references fails
+    engine = attach_cdm_schema(create_loading_engine(f'sqlite:///{path}', pool_size=4,
+                                                     connect_args={'check_same_thread': False}),
+                               path, foreign_keys=True)
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+def _count(engine, model) -> int:
+    with engine.connect() as connection:
+        return connection.execute(select(func.count()).select_from(model.__table__)).scalar()
+
+
+def test_create_loading_engine(engine):
+    assert isinstance(engine.pool, QueuePool)
+    assert engine.pool.size() == 4
+
+
+def test_foreign_key_order():
+    assert foreign_key_order(['tumor', 'lab', 'person']) == ['person', 'lab', 'tumor']
+    assert foreign_key_order(['lab', 'person']) == ['person', 'lab']
+
+
+@pytest.mark.parametrize('load_threads', [1, 3])
+def test_load_tables(engine, load_threads):
+    # sources in reverse foreign key order
+    row_counts = load_tables(engine,
+                             {'person': _identity(Person, PERSONS), 'lab': _identity(Lab, LABS)},
+                             {'lab': _chunks(LABS), 'person': _chunks(PERSONS, 50)},
+                             load_threads=load_threads, queue_size=2, chunk_size=30)
+    assert row_counts == {'person': 300, 'lab': 1000}
+    assert _count(engine, Person) == 300
+    assert _count(engine, Lab) == 1000
+
+
+def test_failing_load_raises_from_write_and_close(engine):
+    writer = PipelinedWriter(engine, load_threads=2, queue_size=1)
+    writer.write(Person, PERSONS)
+    # lab_date is required
+    writer.write(Lab, LABS.drop(columns='lab_date'))
+    with pytest.raises(IntegrityError):
+        writer.flush()
+    with pytest.raises(IntegrityError):
+        writer.write(Lab, LABS)
+    with pytest.raises(IntegrityError):
+        writer.close()
+    assert all(not thread.is_alive() for thread in writer._threads)
+    assert writer.row_counts == {'person': 300}
+
+
+def test_failing_load_drains_the_queue(engine):
+    # the producer is not blocked by a full queue once a load failed
+    with pytest.raises(IntegrityError):
+        with PipelinedWriter(engine, load_threads=1, queue_size=1) as writer:
+            writer.write(Tumor, pd.DataFrame({'pancaim_id': [12345]}))
+            for chunk in _chunks(PERSONS, 10):
+                writer.write(Person, chunk)
+    assert all(not thread.is_alive() for thread in writer._threads)